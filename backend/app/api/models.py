@@ -1,6 +1,10 @@
+from __future__ import annotations
+
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from datetime import datetime
+
+# Response schemas for stored records live in app.core.models
+from app.core.models import SequenceResponse, ClusterResponse, JobResponse, MetricsResponse
 
 
 # Sequence models
@@ -13,69 +17,12 @@ class SequenceCreate(SequenceBase):
     pass
 
 
-class SequenceResponse(SequenceBase):
-    id: int
-    length: int
-    gc_content: float
-    quality_score: float
-    status: str
-    taxonomy: Optional[Dict[str, str]] = None
-    taxonomy_confidence: Optional[float] = None
-    cluster_id: Optional[int] = None
-    created_at: datetime
-    updated_at: datetime
-    
-    class Config:
-        from_attributes = True
-
-
 # Cluster models
-class ClusterBase(BaseModel):
-    name: str = Field(..., description="Name of the cluster")
-
-
 class ClusterRequest(BaseModel):
     min_cluster_size: int = Field(default=5, description="Minimum cluster size for HDBSCAN")
     min_samples: int = Field(default=3, description="Minimum samples for HDBSCAN")
 
 
-class ClusterResponse(ClusterBase):
-    id: int
-    size: int
-    created_at: datetime
-    
-    class Config:
-        from_attributes = True
-
-
-# Job models
-class JobResponse(BaseModel):
-    id: int
-    job_type: str
-    status: str
-    parameters: Optional[Dict[str, Any]] = None
-    result: Optional[Dict[str, Any]] = None
-    error_message: Optional[str] = None
-    created_at: datetime
-    updated_at: datetime
-    
-    class Config:
-        from_attributes = True
-
-
-# Metrics models
-class MetricsResponse(BaseModel):
-    id: int
-    metric_name: str
-    metric_value: float
-    sequence_id: Optional[int] = None
-    cluster_id: Optional[int] = None
-    created_at: datetime
-    
-    class Config:
-        from_attributes = True
-
-
 # Analysis request models
 class SimilarityRequest(BaseModel):
     sequence_id: int = Field(..., description="ID of the query sequence")
@@ -0,0 +1,134 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+import numpy as np
+from typing import Callable, List, Optional
+from app.core.config import get_settings
+import logging
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class EmbedCache:
+    """Content-addressed store of sequence embeddings, keyed by sequence hash and model id.
+
+    The model id should name the numerics too (e.g. DNAEmbedder.cache_id), so fp16, int8 and
+    ONNX variants of one model never share entries.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB NOT NULL, model_id TEXT NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (key, model_id))"
+        )
+        self._conn.commit()
+        self.purge_expired()
+
+    def purge_expired(self) -> int:
+        """Delete entries older than the TTL, returning how many were removed"""
+        if self.ttl_seconds is None:
+            return 0
+        try:
+            with self._lock:
+                deleted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+                ).rowcount
+                self._conn.commit()
+            return deleted
+        except sqlite3.Error as e:
+            logger.error(f"Error purging embedding cache: {e}")
+            return 0
+
+    @staticmethod
+    def _key(sequence: str) -> bytes:
+        return hashlib.blake2b(sequence.encode('utf-8'), digest_size=32).digest()
+
+    def get_many(self, sequences: List[str], model_id: str) -> List[Optional[np.ndarray]]:
+        """Cached embeddings for the sequences, None where missing or expired"""
+        keys = [self._key(sequence) for sequence in sequences]
+        found = {}
+        try:
+            with self._lock:
+                # Stay under SQLite's bound-parameter limit
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector, created_at FROM embeddings WHERE model_id = ? "
+                        f"AND key IN ({','.join('?' * len(chunk))})",
+                        [model_id, *chunk]
+                    ).fetchall()
+                    found.update((key, (vector, created_at)) for key, vector, created_at in rows)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading embedding cache: {e}")
+            return [None] * len(sequences)
+
+        expiry = time.time() - self.ttl_seconds if self.ttl_seconds is not None else None
+        results = []
+        expired = []
+        for key in keys:
+            hit = found.get(key)
+            if hit is not None and expiry is not None and hit[1] < expiry:
+                expired.append((key, model_id))
+                hit = None
+            results.append(np.frombuffer(hit[0], dtype=np.float32) if hit is not None else None)
+
+        if expired:
+            # Drop expired entries now rather than leaving them for the next purge
+            try:
+                with self._lock:
+                    self._conn.executemany("DELETE FROM embeddings WHERE key = ? AND model_id = ?", expired)
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error deleting expired embeddings: {e}")
+        return results
+
+    def put_many(self, sequences: List[str], model_id: str, embeddings: List[Optional[np.ndarray]]) -> bool:
+        """Store embeddings (as float32), skipping None entries"""
+        now = time.time()
+        rows = [
+            (self._key(sequence), model_id, np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for sequence, embedding in zip(sequences, embeddings) if embedding is not None
+        ]
+        try:
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+                self._conn.commit()
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"Error writing embedding cache: {e}")
+            return False
+
+    def get_or_compute(self, sequence: str, model_id: str,
+                       compute: Callable[[str], Optional[np.ndarray]]) -> Optional[np.ndarray]:
+        """Cached embedding of one sequence, computing and storing it on a miss"""
+        return self.get_or_compute_many([sequence], model_id, lambda batch: [compute(batch[0])])[0]
+
+    def get_or_compute_many(self, sequences: List[str], model_id: str,
+                            compute_many: Callable[[List[str]], List[Optional[np.ndarray]]]
+                            ) -> List[Optional[np.ndarray]]:
+        """Cached embeddings for many sequences; misses go to compute_many as one batch"""
+        results = self.get_many(sequences, model_id)
+
+        # Duplicates within the batch are computed once
+        missing = list(dict.fromkeys(seq for seq, hit in zip(sequences, results) if hit is None))
+        if missing:
+            computed = dict(zip(missing, compute_many(missing)))
+            self.put_many(missing, model_id, list(computed.values()))
+            results = [hit if hit is not None else computed[seq] for seq, hit in zip(sequences, results)]
+
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_embed_cache() -> EmbedCache:
+    """Get the shared embedding cache, opening it on first use"""
+    return EmbedCache(settings.embed_cache_path, settings.embed_cache_ttl_seconds)
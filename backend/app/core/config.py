@@ -12,6 +12,9 @@ class Settings(BaseSettings):
     
     # Database settings
     database_url: str = "sqlite:///./edna_database.db"
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle: int = 1800  # seconds before a pooled connection is replaced
     
     # MinIO settings
     minio_endpoint: str = "127.0.0.1:9000"
@@ -21,6 +24,9 @@ class Settings(BaseSettings):
     minio_bucket_raw: str = "edna-raw-data"
     minio_bucket_processed: str = "edna-processed"
     minio_bucket_models: str = "edna-models"
+    minio_part_size: int = 16 * 1024 * 1024  # multipart chunk size for large objects
+    minio_parallel_uploads: int = 4
+    minio_max_connections: int = 32  # keep-alive connections per host, shared by concurrent transfers
     
     # Redis settings (for background jobs)
     redis_url: str = "redis://localhost:6379"
@@ -29,8 +35,30 @@ class Settings(BaseSettings):
     min_sequence_length: int = 100
     min_quality_score: float = 90.0
     embedding_model_name: str = "zhihan1996/DNABERT-2-117M"
+    embedding_token_budget: int = 8192  # max padded tokens (special tokens included) per embedding batch
+    embedding_use_onnx: bool = False  # requires onnxruntime(-gpu)
+    embedding_cuda_graphs: bool = False  # replay captured forwards for repeated batch shapes
+    embedding_quantize_int8: bool = False  # dynamic int8 Linear layers, CPU inference only
+    embedding_compile: bool = False  # torch.compile the pooled forward (reduce-overhead)
+    embed_cache_path: str = "./.edna_embed_cache.db"  # SQLite store of embeddings by sequence hash
+    embed_cache_ttl_seconds: Optional[float] = None  # expired entries are purged on open and on lookup
+    background_batch_size: int = 64  # sequences per batch in background processing
+    background_workers: int = 2  # worker processes for embedding/clustering jobs, each loads the model
+    embedding_storage_int8: bool = False  # store embeddings as int8 + per-vector scale (4x smaller)
+    upload_chunk_size: int = 4 * 1024 * 1024  # bytes read per step when streaming uploads
+    upload_batch_size: int = 1000  # FASTA records validated and inserted together
     clustering_min_cluster_size: int = 5
+    clustering_n_jobs: int = -1  # core-distance workers, -1 uses all cores
+    clustering_approx_mst: bool = True
+    clustering_use_gpu: bool = False  # requires cuML/CuPy
+    clustering_batch_threshold: int = 100000  # cluster in batches above this many sequences
+    clustering_batch_size: int = 3000
+    clustering_batch_epochs: int = 3
+    clustering_batch_seeds: int = 5  # exemplars per known cluster injected into later batches, 0 disables
+    clustering_reducer_sample_size: int = 50000  # rows UMAP is fit on; larger inputs are projected in chunks
     kmer_size: int = 6
+    faiss_index_type: str = "hnsw"  # flat, hnsw, sq8 or ivfpq
+    similarity_batch_window_ms: float = 5.0  # coalesce concurrent similarity queries
     
     # Security settings
     secret_key: str = "your-secret-key-change-this-in-production"
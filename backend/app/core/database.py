@@ -1,37 +1,106 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index, JSON, LargeBinary
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.pool import StaticPool
 from sqlalchemy.sql import func
 from app.core.config import get_settings
 import datetime
+import uuid
+from functools import lru_cache
 
 settings = get_settings()
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+
+# A plain in-memory URL gives every connection its own database, so the sync and async
+# engines would not see each other's tables; both open this named shared-cache one instead
+_MEMORY_URLS = ("sqlite://", "sqlite:///:memory:")
+_SHARED_MEMORY_URL = "sqlite:///file:edna_memdb?mode=memory&cache=shared&uri=true"
+
+
+def _database_url(database_url: str) -> str:
+    """The configured URL, with in-memory SQLite mapped to the shared in-memory database"""
+    return _SHARED_MEMORY_URL if database_url in _MEMORY_URLS else database_url
+
+
+def _engine_options(database_url: str) -> dict:
+    """Pool and statement cache options for the configured database"""
+    options = {"query_cache_size": 1200}
+
+    if "sqlite" in database_url:
+        options["connect_args"] = {"check_same_thread": False}
+        if database_url == _SHARED_MEMORY_URL:
+            # One connection per engine, which also keeps the in-memory database alive
+            options["poolclass"] = StaticPool
+            return options
+
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_pre_ping=True,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
+
+
+def _async_url(database_url: str) -> str:
+    """The same database URL with its asyncio driver"""
+    for scheme, async_scheme in (("postgresql://", "postgresql+asyncpg://"),
+                                 ("sqlite://", "sqlite+aiosqlite://")):
+        if database_url.startswith(scheme):
+            return async_scheme + database_url[len(scheme):]
+    return database_url
+
+
+# Create SQLAlchemy engines; the async one serves request handlers without blocking the loop
+database_url = _database_url(settings.database_url)
+engine = create_engine(database_url, **_engine_options(database_url))
+async_engine = create_async_engine(_async_url(database_url), **_engine_options(database_url))
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
+def _new_id() -> str:
+    return str(uuid.uuid4())
+
+
 # Database Models
 class Sequence(Base):
     __tablename__ = "sequences"
     
-    id = Column(String, primary_key=True, index=True)
-    cluster_id = Column(String, ForeignKey("clusters.id"), nullable=True)
+    id = Column(String, primary_key=True, index=True, default=_new_id)
+    name = Column(String, nullable=True, index=True)  # FASTA header name
+    cluster_id = Column(String, ForeignKey("clusters.id"), nullable=True, index=True)
     sequence_data = Column(Text, nullable=False)
     length = Column(Integer, nullable=False)
+    gc_content = Column(Float, nullable=True)
     quality_score = Column(Float, nullable=False)
+    status = Column(String, nullable=True, default="processing", index=True)  # processing, completed, failed
+    taxonomy = Column(JSON, nullable=True)  # Rank -> name, from the taxonomy assigner
+    taxonomy_confidence = Column(Float, nullable=True)
     taxa = Column(String, nullable=True)
     novelty_score = Column(Float, nullable=True)
     sample_date = Column(DateTime, default=datetime.datetime.utcnow)
     location = Column(String, nullable=True)
     notes = Column(Text, nullable=True)
     embedding_path = Column(String, nullable=True)  # Path in MinIO
+    embedding = Column(LargeBinary, nullable=True)  # Raw float32 vector, np.frombuffer to read
+    embedding_i8 = Column(LargeBinary, nullable=True)  # int8 vector, used instead when quantized storage is on
+    embedding_scale = Column(Float, nullable=True)  # multiply embedding_i8 by this to dequantize
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -42,13 +111,15 @@ class Sequence(Base):
 class Cluster(Base):
     __tablename__ = "clusters"
     
-    id = Column(String, primary_key=True, index=True)
+    id = Column(String, primary_key=True, index=True, default=_new_id)
+    name = Column(String, nullable=True)
     sequence_count = Column(Integer, default=0)
     consensus_sequence = Column(Text, nullable=True)
     novelty_score = Column(Float, nullable=True)
     dominant_taxa = Column(String, nullable=True)
     avg_quality = Column(Float, nullable=True)
     model_path = Column(String, nullable=True)  # Path to clustering model in MinIO
+    center_embedding = Column(LargeBinary, nullable=True)  # Raw float32 center, np.frombuffer to read
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
@@ -58,10 +129,13 @@ class Cluster(Base):
 
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_status_type", "status", "job_type"),
+    )
     
-    id = Column(String, primary_key=True, index=True)
-    job_type = Column(String, nullable=False)  # preprocessing, embedding, clustering, etc.
-    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    id = Column(String, primary_key=True, index=True, default=_new_id)
+    job_type = Column(String, nullable=False, index=True)  # preprocessing, embedding, clustering, etc.
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, running, completed, failed
     input_data = Column(Text, nullable=True)  # JSON string of input parameters
     result_data = Column(Text, nullable=True)  # JSON string of results
     error_message = Column(Text, nullable=True)
@@ -84,7 +158,7 @@ class Metrics(Base):
     total_clusters = Column(Integer, nullable=True)
     novel_taxa_count = Column(Integer, nullable=True)
     quality_score_avg = Column(Float, nullable=True)
-    calculated_at = Column(DateTime(timezone=True), server_default=func.now())
+    calculated_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
 
 class Upload(Base):
@@ -95,12 +169,24 @@ class Upload(Base):
     file_path = Column(String, nullable=False)  # Path in MinIO
     file_size = Column(Integer, nullable=False)
     file_type = Column(String, nullable=False)
-    status = Column(String, nullable=False, default="uploaded")  # uploaded, processing, completed, failed
+    status = Column(String, nullable=False, default="uploaded", index=True)  # uploaded, processing, completed, failed
     sequence_count = Column(Integer, nullable=True)
-    job_id = Column(String, ForeignKey("jobs.id"), nullable=True)
+    job_id = Column(String, ForeignKey("jobs.id"), nullable=True, index=True)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+@lru_cache(maxsize=None)
+def _column_names(model: type) -> tuple:
+    """Column names of a mapped class, computed once per class"""
+    # Binary payloads (raw embeddings) are not part of API rows
+    return tuple(c.name for c in model.__table__.columns if not isinstance(c.type, LargeBinary))
+
+
+def row_to_dict(obj) -> dict:
+    """Map an ORM row to a plain dict of its column values"""
+    return {name: getattr(obj, name) for name in _column_names(type(obj))}
+
+
 # Dependency to get DB session
 def get_db() -> Session:
     db = SessionLocal()
@@ -110,6 +196,30 @@ def get_db() -> Session:
         db.close()
 
 
+async def get_async_db() -> AsyncSession:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _add_missing_columns():
+    """Add model columns and indexes missing from existing tables, e.g. a database created before
+    they were introduced. New columns are nullable, so a plain ALTER TABLE ... ADD COLUMN is enough."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            
+            # create_all skips tables that already exist, indexes included
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
 # Create tables
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
\ No newline at end of file
@@ -0,0 +1,17 @@
+from enum import Enum
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobType(str, Enum):
+    PREPROCESSING = "preprocessing"
+    EMBEDDING = "embedding"
+    CLUSTERING = "clustering"
+    TAXONOMY = "taxonomy"
+    METRICS = "metrics"
+    FULL_ANALYSIS = "full_analysis"
@@ -0,0 +1,139 @@
+import numpy as np
+from typing import AsyncIterator, List, Tuple
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+
+if _NUMBA_AVAILABLE:
+    @njit(cache=True, boundscheck=False)
+    def _fasta_scan(buf: np.ndarray, names: np.ndarray, seq_starts: np.ndarray, seq_out: np.ndarray):
+        """Scan a FASTA buffer in one pass.
+
+        Writes the (start, end) of each record's name (first header token) into names,
+        the record's sequence bytes with whitespace dropped into seq_out, and where each
+        record's sequence starts in seq_out into seq_starts. Returns (records, bytes written).
+        """
+        n = buf.shape[0]
+        n_records = 0
+        pos = 0
+        i = 0
+
+        while i < n:
+            # Leading whitespace doesn't count towards the line
+            while i < n and (buf[i] == 32 or buf[i] == 9 or buf[i] == 13):
+                i += 1
+
+            if i < n and buf[i] == 62:  # b'>'
+                i += 1
+                while i < n and (buf[i] == 32 or buf[i] == 9):
+                    i += 1
+                start = i
+                while i < n and buf[i] > 32:
+                    i += 1
+                names[n_records, 0] = start
+                names[n_records, 1] = i
+                seq_starts[n_records] = pos
+                n_records += 1
+                while i < n and buf[i] != 10:  # b'\n'
+                    i += 1
+            else:
+                while i < n and buf[i] != 10:
+                    # Lines before the first header are ignored
+                    if n_records and buf[i] > 32:
+                        seq_out[pos] = buf[i]
+                        pos += 1
+                    i += 1
+            i += 1
+
+        return n_records, pos
+
+
+# Whitespace dropped from sequence lines, in one bytes.translate call per record
+_WHITESPACE = b" \t\r\n\v\f"
+
+
+def _parse_fasta_python(content: bytes) -> List[Tuple[str, str]]:
+    """Header-to-header parser built on bytes.find, used when numba is not installed"""
+    sequences = []
+    # Lines before the first header are ignored
+    start = 0 if content.startswith(b'>') else content.find(b'\n>')
+    if start < 0:
+        return sequences
+    
+    while start >= 0:
+        header_start = content.index(b'>', start) + 1
+        header_end = content.find(b'\n', header_start)
+        if header_end < 0:
+            header_end = len(content)
+        next_header = content.find(b'\n>', header_end)
+        record_end = len(content) if next_header < 0 else next_header
+        
+        fields = content[header_start:header_end].split(None, 1)
+        seq_bytes = content[header_end:record_end].translate(None, _WHITESPACE)
+        if fields and seq_bytes:
+            # Take first part of header
+            sequences.append((fields[0].decode('utf-8'), seq_bytes.decode('utf-8')))
+        
+        start = next_header
+    
+    return sequences
+
+
+def parse_fasta(content: bytes) -> List[Tuple[str, str]]:
+    """Parse raw FASTA bytes into (name, sequence) pairs.
+
+    The name is the first whitespace-delimited token of the header; records without
+    a name or without sequence are skipped.
+    """
+    if not _NUMBA_AVAILABLE:
+        return _parse_fasta_python(content)
+
+    buf = np.frombuffer(content, dtype=np.uint8)
+    # Every record starts with '>', so that count bounds the number of records
+    max_records = content.count(b'>')
+    names = np.empty((max_records, 2), dtype=np.int64)
+    seq_starts = np.empty(max_records + 1, dtype=np.int64)
+    seq_out = np.empty(buf.shape[0], dtype=np.uint8)
+    n_records, n_bytes = _fasta_scan(buf, names, seq_starts, seq_out)
+    seq_starts[n_records] = n_bytes
+
+    sequences = []
+    for r in range(n_records):
+        start, end = seq_starts[r], seq_starts[r + 1]
+        if start == end or names[r, 0] == names[r, 1]:
+            continue
+        name = content[names[r, 0]:names[r, 1]].decode('utf-8')
+        sequences.append((name, seq_out[start:end].tobytes().decode('utf-8')))
+
+    return sequences
+
+
+async def parse_fasta_stream(file, chunk_size: int = 4 * 1024 * 1024) -> AsyncIterator[Tuple[str, str]]:
+    """Parse FASTA records from an async file-like object (e.g. an UploadFile) as they complete.
+
+    Reads chunk_size bytes at a time and carries the unfinished last record over to the
+    next chunk, so memory stays around one chunk plus one record.
+    """
+    tail = b""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        
+        buf = tail + chunk
+        # Everything before the last header line is made of complete records
+        boundary = buf.rfind(b'\n>')
+        if boundary < 0:
+            tail = buf
+            continue
+        
+        tail = buf[boundary + 1:]
+        for record in parse_fasta(buf[:boundary + 1]):
+            yield record
+    
+    for record in parse_fasta(tail):
+        yield record
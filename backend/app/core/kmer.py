@@ -0,0 +1,127 @@
+import numpy as np
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+try:
+    from numba import njit
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Without numba the kernels below run as plain Python"""
+        return lambda func: func
+
+# 2-bit codes for A/C/G/T in either case; every other byte maps to 255
+BASE_CODES = np.full(256, 255, dtype=np.uint8)
+for _code, _base in enumerate(b"ACGT"):
+    BASE_CODES[_base] = _code
+    BASE_CODES[_base + 32] = _code
+
+
+@njit(cache=True, boundscheck=False)
+def _rolling_kmers(seq: np.ndarray, k: int, lut: np.ndarray, out: np.ndarray) -> int:
+    """Write the rolling 2-bit hash of every ACGT-only k-mer of seq into out"""
+    mask = (1 << (2 * k)) - 1
+    h = 0
+    run = 0
+    n = 0
+
+    for i in range(seq.shape[0]):
+        code = lut[seq[i]]
+        if code == 255:
+            # Ambiguous base: restart the window after it
+            h = 0
+            run = 0
+            continue
+
+        h = ((h << 2) | code) & mask
+        run += 1
+        if run >= k:
+            out[n] = h
+            n += 1
+
+    return n
+
+
+if not _NUMBA_AVAILABLE:
+    def _rolling_kmers(seq: np.ndarray, k: int, lut: np.ndarray, out: np.ndarray) -> int:
+        """NumPy version of _rolling_kmers over a sliding window view"""
+        n_windows = seq.shape[0] - k + 1
+        if n_windows <= 0:
+            return 0
+
+        codes = lut[seq]
+        # A window is kept when no ambiguous base falls inside it
+        ambiguous = np.zeros(seq.shape[0] + 1, dtype=np.int64)
+        np.cumsum(codes == 255, out=ambiguous[1:])
+        keep = ambiguous[k:] == ambiguous[:n_windows]
+
+        windows = np.lib.stride_tricks.sliding_window_view(codes, k)[keep]
+        shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+        hashes = (windows.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+
+        out[:hashes.shape[0]] = hashes
+        return hashes.shape[0]
+
+
+def _to_bytes(sequence: str) -> np.ndarray:
+    """View a sequence as a uint8 array"""
+    return np.frombuffer(sequence.encode('ascii', 'ignore'), dtype=np.uint8)
+
+
+def kmer_hashes(sequence: str, k: int = 6) -> np.ndarray:
+    """Get the 2-bit packed hash (A=0, C=1, G=2, T=3) of every k-mer in a sequence.
+
+    K-mers spanning a non-ACGT base are skipped. Hashes fit in uint32 for k <= 16.
+    """
+    if not 1 <= k <= 16:
+        raise ValueError(f"k must be between 1 and 16, got {k}")
+
+    seq = _to_bytes(sequence)
+    out = np.empty(seq.shape[0], dtype=np.uint32)
+    n = _rolling_kmers(seq, k, BASE_CODES, out)
+
+    return out[:n]
+
+
+def seqs_to_padded(sequences: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode sequences into one zero-padded (N, max length) uint8 matrix plus their lengths"""
+    encoded = [sequence.encode('ascii', 'ignore') for sequence in sequences]
+    lengths = np.fromiter((len(seq) for seq in encoded), dtype=np.int32, count=len(encoded))
+    width = int(lengths.max()) if len(encoded) else 0
+
+    padded = np.zeros((len(encoded), width), dtype=np.uint8)
+    # Row-major order of the mask matches the order of the concatenated bytes
+    padded[np.arange(width) < lengths[:, None]] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    return padded, lengths
+
+
+@njit(cache=True, boundscheck=False)
+def _build_kmer_bytes(seq: np.ndarray, k: int, n_kmers: int, out: np.ndarray):
+    """Write the first n_kmers k-mers of seq into out, separated by spaces"""
+    pos = 0
+    for i in range(n_kmers):
+        if i:
+            out[pos] = 32  # b' '
+            pos += 1
+        for j in range(k):
+            out[pos + j] = seq[i + j]
+        pos += k
+
+
+@lru_cache(maxsize=4096)
+def kmer_string(sequence: str, k: int = 6, max_kmers: Optional[int] = None) -> str:
+    """Get the space-separated overlapping k-mers of a sequence, e.g. for a k-mer tokenizer"""
+    seq = _to_bytes(sequence)
+    n_kmers = max(seq.shape[0] - k + 1, 0)
+    if max_kmers is not None:
+        n_kmers = min(n_kmers, max_kmers)
+    if not n_kmers:
+        return ""
+
+    out = np.empty(n_kmers * (k + 1) - 1, dtype=np.uint8)
+    _build_kmer_bytes(seq, k, n_kmers, out)
+
+    return out.tobytes().decode('ascii')
@@ -1,31 +1,21 @@
+from __future__ import annotations
+
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from enum import Enum
-
-
-class JobStatus(str, Enum):
-    PENDING = "pending"
-    RUNNING = "running"
-    COMPLETED = "completed"
-    FAILED = "failed"
-
-
-class JobType(str, Enum):
-    PREPROCESSING = "preprocessing"
-    EMBEDDING = "embedding"
-    CLUSTERING = "clustering"
-    TAXONOMY = "taxonomy"
-    METRICS = "metrics"
-    FULL_ANALYSIS = "full_analysis"
 
 
 # Base models
 class SequenceBase(BaseModel):
     id: str
+    name: Optional[str] = None
     sequence_data: str
     length: int
+    gc_content: Optional[float] = None
     quality_score: float
+    status: Optional[str] = None
+    taxonomy: Optional[Dict[str, Any]] = None
+    taxonomy_confidence: Optional[float] = None
     taxa: Optional[str] = None
     novelty_score: Optional[float] = None
     sample_date: Optional[datetime] = None
@@ -58,6 +48,7 @@ class SequenceResponse(SequenceBase):
 
 class ClusterBase(BaseModel):
     id: str
+    name: Optional[str] = None
     sequence_count: int = 0
     consensus_sequence: Optional[str] = None
     novelty_score: Optional[float] = None
@@ -176,7 +167,8 @@ class PaginatedResponse(BaseModel):
     @classmethod
     def create(cls, items: List[Any], total: int, page: int, limit: int):
         pages = (total + limit - 1) // limit
-        return cls(
+        # Every field is supplied and already typed, so skip re-validating the items
+        return cls.model_construct(
             items=items,
             total=total,
             page=page,
@@ -1,7 +1,15 @@
+import hashlib
 import io
-import json
+import os
+import re
 import pickle
-from typing import Any, Optional, BinaryIO
+import tempfile
+import orjson
+from functools import lru_cache
+import numpy as np
+import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, BinaryIO, Tuple
 from minio import Minio
 from minio.error import S3Error
 from app.core.config import get_settings
@@ -10,6 +18,9 @@ import logging
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# ETag of an object uploaded in one part: the hex MD5 of its content
+_MD5_ETAG = re.compile(r"[0-9a-f]{32}")
+
 
 class MinIOClient:
     def __init__(self):
@@ -17,10 +28,23 @@ class MinIOClient:
             settings.minio_endpoint,
             access_key=settings.minio_access_key,
             secret_key=settings.minio_secret_key,
-            secure=settings.minio_secure
+            secure=settings.minio_secure,
+            http_client=self._http_client()
         )
         self._ensure_buckets()
     
+    @staticmethod
+    def _http_client() -> urllib3.PoolManager:
+        """Connection pool sized for concurrent transfers (the minio default keeps 10 connections)"""
+        return urllib3.PoolManager(
+            timeout=urllib3.Timeout(connect=10, read=300),
+            # Threads of download_many_to_paths and parallel uploads each keep a connection alive
+            maxsize=settings.minio_max_connections,
+            # The system trust store (or SSL_CERT_FILE, if set) verifies the server
+            cert_reqs="CERT_REQUIRED",
+            retries=urllib3.Retry(total=3, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+        )
+    
     def _ensure_buckets(self):
         """Ensure all required buckets exist"""
         buckets = [
@@ -46,9 +70,12 @@ class MinIOClient:
             file_size = file_data.tell()
             file_data.seek(0)  # Seek back to beginning
             
+            # Large objects are sent as a parallel multipart upload
             self.client.put_object(
                 bucket, object_name, file_data, file_size,
-                content_type=content_type
+                content_type=content_type,
+                part_size=settings.minio_part_size,
+                num_parallel_uploads=settings.minio_parallel_uploads
             )
             logger.info(f"Uploaded {object_name} to bucket {bucket}")
             return True
@@ -68,11 +95,80 @@ class MinIOClient:
             logger.error(f"Error downloading {object_name}: {e}")
             return None
     
+    def download_to_path(self, bucket: str, object_name: str, file_path: str) -> bool:
+        """Download an object to a local file, skipping it if the local copy is current.
+        
+        The object's ETag and size are kept in a '<file_path>.etag' sidecar; when they
+        still match the object, the file is left as is. Objects uploaded in a single part
+        are checked against their ETag (the MD5 of the content) before replacing the file.
+        """
+        etag_path = f"{file_path}.etag"
+        temp_path = None
+        try:
+            stat = self.client.stat_object(bucket, object_name)
+            version = f"{stat.etag}:{stat.size}"
+            
+            if os.path.exists(file_path) and os.path.exists(etag_path):
+                with open(etag_path) as f:
+                    if f.read() == version:
+                        return True
+            
+            # Hash while writing, so verification costs no second pass over the file
+            digest = hashlib.md5(usedforsecurity=False)
+            response = self.client.get_object(bucket, object_name)
+            try:
+                with tempfile.NamedTemporaryFile(dir=os.path.dirname(file_path) or ".", delete=False) as f:
+                    temp_path = f.name
+                    for chunk in response.stream(1024 * 1024):
+                        digest.update(chunk)
+                        f.write(chunk)
+            finally:
+                response.close()
+                response.release_conn()
+            
+            # Multipart ETags ("<md5 of part md5s>-<parts>") are not a content hash
+            if _MD5_ETAG.fullmatch(stat.etag) and digest.hexdigest() != stat.etag:
+                logger.error(f"Checksum mismatch downloading {object_name}")
+                return False
+            
+            # Rename over the old file, so readers mapping it keep it intact
+            os.replace(temp_path, file_path)
+            temp_path = None
+            with open(etag_path, "w") as f:
+                f.write(version)
+            return True
+        except (S3Error, OSError) as e:
+            logger.error(f"Error downloading {object_name} to {file_path}: {e}")
+            return False
+        finally:
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def download_many_to_paths(self, bucket: str, targets: Dict[str, str],
+                               max_workers: int = 16) -> Dict[str, bool]:
+        """Download several objects to local files concurrently (see download_to_path)"""
+        return self._map_concurrently(
+            lambda object_name: self.download_to_path(bucket, object_name, targets[object_name]),
+            list(targets), max_workers
+        )
+    
+    @staticmethod
+    def _map_concurrently(fn, object_names: List[str], max_workers: int) -> Dict[str, Any]:
+        """Apply fn to every object name on a thread pool, keyed by object name"""
+        if not object_names:
+            return {}
+        
+        # Each transfer mostly waits on the network, so a thread pool overlaps them
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(object_names))) as pool:
+            return dict(zip(object_names, pool.map(fn, object_names)))
+    
     def upload_json(self, bucket: str, object_name: str, data: Any) -> bool:
         """Upload JSON data to MinIO"""
         try:
-            json_data = json.dumps(data, indent=2, default=str)
-            json_bytes = json_data.encode('utf-8')
+            json_bytes = orjson.dumps(
+                data, default=str,
+                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
             return self.upload_file(
                 bucket, object_name, io.BytesIO(json_bytes), 
                 content_type="application/json"
@@ -86,14 +182,14 @@ class MinIOClient:
         try:
             data = self.download_file(bucket, object_name)
             if data:
-                return json.loads(data.decode('utf-8'))
+                return orjson.loads(data)
             return None
         except Exception as e:
             logger.error(f"Error downloading JSON {object_name}: {e}")
             return None
     
     def upload_pickle(self, bucket: str, object_name: str, data: Any) -> bool:
-        """Upload pickled data to MinIO"""
+        """Upload pickled data to MinIO (for ad-hoc debugging, not model storage)"""
         try:
             pickle_data = pickle.dumps(data)
             return self.upload_file(
@@ -105,7 +201,7 @@ class MinIOClient:
             return False
     
     def download_pickle(self, bucket: str, object_name: str) -> Optional[Any]:
-        """Download pickled data from MinIO"""
+        """Download pickled data from MinIO (for ad-hoc debugging, not model storage)"""
         try:
             data = self.download_file(bucket, object_name)
             if data:
@@ -143,10 +239,20 @@ class MinIOClient:
             return False
 
 
-# Global MinIO client instance
-minio_client = MinIOClient()
+def quantize_embedding(embedding: np.ndarray) -> Tuple[bytes, float]:
+    """Symmetric per-vector int8 quantization; returns the int8 bytes and the dequantization scale"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    scale = float(np.abs(vector).max()) / 127 or 1.0
+    return np.round(vector / scale).astype(np.int8).tobytes(), scale
+
+
+def dequantize_embeddings(blobs: List[bytes], scales: List[float]) -> np.ndarray:
+    """Stack int8 embedding bytes into one float32 (N, d) matrix, scaling each row back"""
+    quantized = np.frombuffer(b"".join(blobs), dtype=np.int8).reshape(len(blobs), -1)
+    return quantized.astype(np.float32) * np.asarray(scales, dtype=np.float32)[:, None]
 
 
+@lru_cache(maxsize=None)
 def get_minio_client() -> MinIOClient:
-    """Get the global MinIO client instance"""
-    return minio_client
\ No newline at end of file
+    """Get the global MinIO client instance, connecting on first use"""
+    return MinIOClient()
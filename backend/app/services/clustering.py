@@ -1,9 +1,10 @@
+import asyncio
 import io
+import threading
 import numpy as np
-import hdbscan
-import faiss
-from sklearn.preprocessing import StandardScaler
-from typing import List, Dict, Any, Optional, Tuple
+import joblib
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
 from app.core.config import get_settings
 from app.core.utils import get_minio_client
@@ -17,28 +18,78 @@ class SequenceClusterer:
     
     def __init__(self):
         self.clusterer = None
-        self.scaler = StandardScaler()
-        self.minio_client = get_minio_client()
+        self.batched_fit = False  # labels merged from many per-batch fits, see _cluster_batched
+        self.mean = None
+        self.std = None
+        self.reducer = None
         self.min_cluster_size = 5
         self.min_samples = 3
+        self.n_components = 10
+        self.n_neighbors = 30
     
-    def _prepare_embeddings(self, embeddings: List[np.ndarray]) -> np.ndarray:
-        """Prepare embeddings for clustering"""
+    def _prepare_embeddings(self, embeddings: Union[np.ndarray, List[np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Prepare embeddings for clustering.
+        
+        Returns the standardized embeddings and the (possibly UMAP-reduced) matrix to cluster.
+        """
+        from umap import UMAP
+        
         # Filter out None embeddings
-        valid_embeddings = [emb for emb in embeddings if emb is not None]
+        if isinstance(embeddings, np.ndarray):
+            if not embeddings.size:
+                raise ValueError("No valid embeddings provided")
+            # Copy, since the matrix is modified in place below
+            embedding_matrix = np.array(embeddings, dtype=np.float32, ndmin=2)
+        else:
+            valid_embeddings = [emb for emb in embeddings if emb is not None]
+            
+            if not valid_embeddings:
+                raise ValueError("No valid embeddings provided")
+            
+            # Stack embeddings into a fresh float32 matrix that can be modified in place
+            embedding_matrix = np.vstack(valid_embeddings).astype(np.float32, copy=False)
+        
+        # Standardize features in place; constant features are left unscaled
+        self.mean = embedding_matrix.mean(axis=0, dtype=np.float32)
+        self.std = embedding_matrix.std(axis=0, dtype=np.float32)
+        self.std[self.std == 0] = 1.0
+        np.subtract(embedding_matrix, self.mean, out=embedding_matrix)
+        np.divide(embedding_matrix, self.std, out=embedding_matrix)
+        normalized_embeddings = embedding_matrix
+        
+        # Reduce to a low-dimensional space so HDBSCAN can use its KD-tree path.
+        # UMAP needs more samples than neighbors to build its graph.
+        if (normalized_embeddings.shape[1] <= self.n_components
+                or normalized_embeddings.shape[0] <= self.n_neighbors):
+            self.reducer = None
+            return normalized_embeddings, normalized_embeddings
         
-        if not valid_embeddings:
-            raise ValueError("No valid embeddings provided")
+        self.reducer = UMAP(
+            n_components=self.n_components,
+            metric='cosine',
+            n_neighbors=self.n_neighbors,
+            low_memory=True
+        )
         
-        # Stack embeddings into matrix
-        embedding_matrix = np.vstack(valid_embeddings)
+        n_samples = normalized_embeddings.shape[0]
+        if n_samples <= settings.clustering_reducer_sample_size:
+            return normalized_embeddings, self.reducer.fit_transform(normalized_embeddings)
         
-        # Normalize embeddings
-        normalized_embeddings = self.scaler.fit_transform(embedding_matrix)
+        # Fit the UMAP graph on a random subsample and project every row in chunks,
+        # so the neighbor graph stays bounded for very large inputs
+        rng = np.random.default_rng(42)
+        fit_idx = rng.choice(n_samples, settings.clustering_reducer_sample_size, replace=False)
+        self.reducer.fit(normalized_embeddings[fit_idx])
         
-        return normalized_embeddings
+        chunk_size = settings.clustering_batch_size
+        reduced_embeddings = np.vstack([
+            self.reducer.transform(normalized_embeddings[start:start + chunk_size])
+            for start in range(0, n_samples, chunk_size)
+        ])
+        
+        return normalized_embeddings, reduced_embeddings
     
-    def cluster_sequences(self, embeddings: List[np.ndarray], 
+    def cluster_sequences(self, embeddings: Union[np.ndarray, List[np.ndarray]], 
                          min_cluster_size: Optional[int] = None,
                          min_samples: Optional[int] = None) -> Dict[str, Any]:
         """Cluster sequences based on their embeddings"""
@@ -49,27 +100,27 @@ class SequenceClusterer:
                 min_samples = self.min_samples
             
             # Prepare embeddings
-            normalized_embeddings = self._prepare_embeddings(embeddings)
-            
-            # Initialize HDBSCAN clusterer
-            self.clusterer = hdbscan.HDBSCAN(
-                min_cluster_size=min_cluster_size,
-                min_samples=min_samples,
-                metric='euclidean',
-                cluster_selection_method='eom'
-            )
-            
-            # Perform clustering
-            cluster_labels = self.clusterer.fit_predict(normalized_embeddings)
+            normalized_embeddings, reduced_embeddings = self._prepare_embeddings(embeddings)
+            
+            # Perform clustering, in bounded batches for very large inputs
+            self.batched_fit = len(reduced_embeddings) > settings.clustering_batch_threshold
+            if self.batched_fit:
+                cluster_labels, cluster_probabilities = self._cluster_batched(
+                    reduced_embeddings, min_cluster_size, min_samples,
+                    batch_size=settings.clustering_batch_size,
+                    n_epochs=settings.clustering_batch_epochs,
+                    n_seeds=settings.clustering_batch_seeds
+                )
+            else:
+                cluster_labels, cluster_probabilities = self._fit_predict(
+                    reduced_embeddings, min_cluster_size, min_samples
+                )
             
             # Calculate cluster statistics
             unique_labels = np.unique(cluster_labels)
             n_clusters = len(unique_labels) - (1 if -1 in cluster_labels else 0)
             n_noise = list(cluster_labels).count(-1)
             
-            # Get cluster probabilities
-            cluster_probabilities = self.clusterer.probabilities_
-            
             # Create cluster assignments
             cluster_assignments = []
             for i, label in enumerate(cluster_labels):
@@ -85,6 +136,7 @@ class SequenceClusterer:
                 "n_noise": n_noise,
                 "cluster_labels": cluster_labels.tolist(),
                 "cluster_assignments": cluster_assignments,
+                # Centers live in the standardized embedding space, not the UMAP projection
                 "cluster_centers": self._calculate_cluster_centers(normalized_embeddings, cluster_labels)
             }
             
@@ -92,40 +144,231 @@ class SequenceClusterer:
             logger.error(f"Error clustering sequences: {e}")
             raise
     
+    def _fit_predict(self, embeddings: np.ndarray, min_cluster_size: int,
+                     min_samples: int) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Fit HDBSCAN, on the GPU when enabled, and return labels and probabilities"""
+        if settings.clustering_use_gpu:
+            try:
+                import cupy as cp
+                from cuml.cluster import HDBSCAN as cuHDBSCAN
+            except ImportError:
+                logger.warning("cuML is not available, falling back to CPU HDBSCAN")
+            else:
+                self.clusterer = cuHDBSCAN(
+                    min_cluster_size=min_cluster_size,
+                    min_samples=min_samples,
+                    metric='euclidean',
+                    cluster_selection_method='eom'
+                )
+                # Copy the matrix to the device once; cuML keeps outputs on the GPU
+                device_embeddings = cp.asarray(embeddings, dtype=cp.float32)
+                cluster_labels = self.clusterer.fit_predict(device_embeddings)
+                return cp.asnumpy(cluster_labels), cp.asnumpy(self.clusterer.probabilities_)
+        
+        import hdbscan
+        
+        # hdbscan works on C-contiguous float64; convert once here rather than per tree build
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float64)
+        self.clusterer = hdbscan.HDBSCAN(
+            min_cluster_size=min_cluster_size,
+            min_samples=min_samples,
+            metric='euclidean',
+            algorithm=self._tree_algorithm(embeddings.shape[1]),
+            cluster_selection_method='eom',
+            core_dist_n_jobs=settings.clustering_n_jobs,
+            approx_min_span_tree=settings.clustering_approx_mst,
+            gen_min_span_tree=False
+        )
+        cluster_labels = self.clusterer.fit_predict(embeddings)
+        
+        return cluster_labels, self.clusterer.probabilities_
+    
+    @staticmethod
+    def _tree_algorithm(dimension: int) -> str:
+        """Pick the HDBSCAN tree for the embedding dimensionality"""
+        # KD-trees degrade towards brute force above ~20 dimensions, which happens
+        # when UMAP is skipped for small inputs; ball trees hold up better there
+        return 'boruvka_kdtree' if dimension <= 20 else 'boruvka_balltree'
+    
+    def _cluster_batched(self, embeddings: np.ndarray, min_cluster_size: int, min_samples: int,
+                         batch_size: int = 3000, n_epochs: int = 3,
+                         n_seeds: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Cluster shuffled batches, re-pooling noise points each epoch.
+        
+        Every batch after the first also carries up to n_seeds exemplars of each cluster
+        found so far; a batch cluster that absorbs seeds takes over their label instead of
+        opening a new one. Clusters that still overlap afterwards are merged by centroid.
+        """
+        n_samples = embeddings.shape[0]
+        labels = np.full(n_samples, -1, dtype=np.int64)
+        probabilities = np.zeros(n_samples, dtype=np.float64)
+        rng = np.random.default_rng(42)
+        pending = rng.permutation(n_samples)
+        seeds = np.empty((0, embeddings.shape[1]), dtype=embeddings.dtype)
+        seed_labels = np.empty(0, dtype=np.int64)
+        next_label = 0
+        
+        for epoch in range(n_epochs):
+            noise = []
+            for start in range(0, len(pending), batch_size):
+                batch_idx = pending[start:start + batch_size]
+                if len(batch_idx) < max(min_cluster_size, min_samples + 1):
+                    noise.append(batch_idx)
+                    continue
+                
+                # Keep the injected seeds from outweighing the batch itself
+                injected = np.arange(len(seeds))
+                if len(injected) > len(batch_idx):
+                    injected = rng.choice(injected, len(batch_idx), replace=False)
+                
+                batch_labels, batch_probabilities = self._fit_predict(
+                    np.vstack([embeddings[batch_idx], seeds[injected]]), min_cluster_size, min_samples
+                )
+                point_labels = batch_labels[:len(batch_idx)]
+                seed_hits = batch_labels[len(batch_idx):]
+                clustered = point_labels != -1
+                
+                if clustered.any():
+                    # Batch-local label -> global label: the majority label of the seeds it
+                    # absorbed, or a fresh label (with its own seeds) if it absorbed none
+                    local_to_global = np.full(int(point_labels.max()) + 1, -1, dtype=np.int64)
+                    for local in np.unique(point_labels[clustered]):
+                        absorbed = seed_labels[injected[seed_hits == local]]
+                        if len(absorbed):
+                            local_to_global[local] = np.bincount(absorbed).argmax()
+                            continue
+                        
+                        local_to_global[local] = next_label
+                        if n_seeds:
+                            members = embeddings[batch_idx[point_labels == local]]
+                            nearest = np.argsort(
+                                np.linalg.norm(members - members.mean(axis=0), axis=1)
+                            )[:n_seeds]
+                            seeds = np.vstack([seeds, members[nearest]])
+                            seed_labels = np.concatenate(
+                                [seed_labels, np.full(len(nearest), next_label, dtype=np.int64)]
+                            )
+                        next_label += 1
+                    
+                    labels[batch_idx[clustered]] = local_to_global[point_labels[clustered]]
+                    if batch_probabilities is not None:
+                        probabilities[batch_idx[clustered]] = batch_probabilities[:len(batch_idx)][clustered]
+                
+                noise.append(batch_idx[~clustered])
+            
+            remaining = np.concatenate(noise)
+            logger.info(f"Batched clustering epoch {epoch + 1}: {len(remaining)}/{n_samples} noise points")
+            
+            # Stop once no noise is left or re-pooling stops recovering points
+            if len(remaining) == 0 or len(remaining) == len(pending):
+                break
+            pending = rng.permutation(remaining)
+        
+        # No single estimator describes labels merged across batches
+        self.clusterer = None
+        
+        return self._merge_overlapping_clusters(embeddings, labels), probabilities
+    
+    @staticmethod
+    def _merge_overlapping_clusters(embeddings: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """Merge clusters whose centroid lies within the other's RMS radius, and relabel 0..n-1"""
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        from scipy.spatial import cKDTree
+        
+        clustered = labels != -1
+        if not clustered.any():
+            return labels
+        
+        # Per-cluster centroid and RMS radius from one pass of sums
+        cluster_ids, inverse = np.unique(labels[clustered], return_inverse=True)
+        counts = np.bincount(inverse).astype(np.float64)
+        points = embeddings[clustered].astype(np.float64)
+        sums = np.zeros((len(cluster_ids), embeddings.shape[1]))
+        np.add.at(sums, inverse, points)
+        centroids = sums / counts[:, None]
+        sq_dist = np.square(points - centroids[inverse]).sum(axis=1)
+        radii = np.sqrt(np.bincount(inverse, weights=sq_dist) / counts)
+        
+        # Candidate pairs from a KD-tree, kept when either cluster contains the other's centroid
+        pairs = cKDTree(centroids).query_pairs(r=float(radii.max()), output_type='ndarray')
+        if len(pairs):
+            distances = np.linalg.norm(centroids[pairs[:, 0]] - centroids[pairs[:, 1]], axis=1)
+            pairs = pairs[distances <= np.maximum(radii[pairs[:, 0]], radii[pairs[:, 1]])]
+        
+        n_clusters = len(cluster_ids)
+        graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(n_clusters, n_clusters))
+        _, components = connected_components(graph, directed=False)
+        
+        # Components are numbered 0..n-1, which doubles as the compact relabeling
+        merged = np.full_like(labels, -1)
+        merged[clustered] = components[inverse]
+        return merged
+    
     def _calculate_cluster_centers(self, embeddings: np.ndarray, labels: np.ndarray) -> Dict[int, List[float]]:
         """Calculate cluster centers"""
-        centers = {}
-        unique_labels = np.unique(labels)
+        labels = np.asarray(labels)
+        valid = labels != -1  # Skip noise
+        if not valid.any():
+            return {}
         
-        for label in unique_labels:
-            if label == -1:  # Skip noise
-                continue
-                
-            cluster_mask = labels == label
-            cluster_embeddings = embeddings[cluster_mask]
-            center = np.mean(cluster_embeddings, axis=0)
-            centers[int(label)] = center.tolist()
+        # Accumulate every cluster's sum in a single pass over the embeddings
+        valid_labels = labels[valid]
+        counts = np.bincount(valid_labels)
+        sums = np.zeros((counts.size, embeddings.shape[1]), dtype=np.float64)
+        np.add.at(sums, valid_labels, embeddings[valid])
+        
+        cluster_ids = np.flatnonzero(counts)
+        centers = sums[cluster_ids] / counts[cluster_ids, None]
         
-        return centers
+        return {int(label): center.tolist() for label, center in zip(cluster_ids, centers)}
+    
+    def _serialize_cluster_model(self, model_id: str) -> Dict[str, io.BytesIO]:
+        """Serialize the fitted model into MinIO object names and payloads"""
+        # Fitted estimators are streamed through joblib with LZ4 compression
+        model_buffer = io.BytesIO()
+        joblib.dump(
+            {"clusterer": self.clusterer, "reducer": self.reducer},
+            model_buffer, compress=("lz4", 3)
+        )
+        
+        # Normalization statistics and hyperparameters are plain arrays
+        params_buffer = io.BytesIO()
+        np.savez_compressed(
+            params_buffer,
+            mean=self.mean,
+            std=self.std,
+            min_cluster_size=self.min_cluster_size,
+            min_samples=self.min_samples
+        )
+        
+        return {
+            f"clustering_models/{model_id}/model.joblib": model_buffer,
+            f"clustering_models/{model_id}/params.npz": params_buffer
+        }
+    
+    def _check_saveable(self) -> bool:
+        """Whether there is one fitted model that describes the current labels"""
+        if self.batched_fit:
+            logger.error("Batched clustering merges many per-batch fits; there is no single model to save")
+            return False
+        if self.clusterer is None:
+            logger.error("No clusterer model to save")
+            return False
+        return True
     
     def save_cluster_model(self, model_id: str) -> bool:
         """Save clustering model to MinIO"""
         try:
-            if self.clusterer is None:
-                logger.error("No clusterer model to save")
+            if not self._check_saveable():
                 return False
             
-            model_data = {
-                "clusterer": self.clusterer,
-                "scaler": self.scaler,
-                "min_cluster_size": self.min_cluster_size,
-                "min_samples": self.min_samples
-            }
+            objects = self._serialize_cluster_model(model_id)
             
-            object_name = f"clustering_models/{model_id}.pkl"
-            return self.minio_client.upload_pickle(
-                settings.minio_bucket_models, object_name, model_data
-            )
+            return all([
+                get_minio_client().upload_file(settings.minio_bucket_models, object_name, data)
+                for object_name, data in objects.items()
+            ])
             
         except Exception as e:
             logger.error(f"Error saving cluster model: {e}")
@@ -134,19 +377,27 @@ class SequenceClusterer:
     def load_cluster_model(self, model_id: str) -> bool:
         """Load clustering model from MinIO"""
         try:
-            object_name = f"clustering_models/{model_id}.pkl"
-            model_data = self.minio_client.download_pickle(
-                settings.minio_bucket_models, object_name
+            model_bytes = get_minio_client().download_file(
+                settings.minio_bucket_models, f"clustering_models/{model_id}/model.joblib"
+            )
+            params_bytes = get_minio_client().download_file(
+                settings.minio_bucket_models, f"clustering_models/{model_id}/params.npz"
             )
             
-            if model_data is None:
+            if model_bytes is None or params_bytes is None:
                 logger.error(f"Cluster model {model_id} not found")
                 return False
             
+            model_data = joblib.load(io.BytesIO(model_bytes))
+            self.batched_fit = False
             self.clusterer = model_data["clusterer"]
-            self.scaler = model_data["scaler"]
-            self.min_cluster_size = model_data["min_cluster_size"]
-            self.min_samples = model_data["min_samples"]
+            self.reducer = model_data["reducer"]
+            
+            with np.load(io.BytesIO(params_bytes)) as params:
+                self.mean = params["mean"]
+                self.std = params["std"]
+                self.min_cluster_size = int(params["min_cluster_size"])
+                self.min_samples = int(params["min_samples"])
             
             return True
             
@@ -160,12 +411,15 @@ class SimilaritySearcher:
     
     def __init__(self):
         self.index = None
-        self.embeddings = None
+        self.embeddings_shape = None
         self.sequence_ids = None
-        self.minio_client = get_minio_client()
+        # Searches run on a worker thread (see SimilarityBatcher) while adds happen on the event loop
+        self._lock = threading.RLock()
     
     def build_index(self, embeddings: List[np.ndarray], sequence_ids: List[str]) -> bool:
         """Build FAISS index for similarity search"""
+        import faiss
+        
         try:
             # Filter valid embeddings
             valid_data = [(emb, seq_id) for emb, seq_id in zip(embeddings, sequence_ids) 
@@ -179,17 +433,28 @@ class SimilaritySearcher:
             embedding_matrix = np.vstack(valid_embeddings).astype(np.float32)
             
             # Build FAISS index
-            dimension = embedding_matrix.shape[1]
-            self.index = faiss.IndexFlatIP(dimension)  # Inner product (cosine similarity)
+            n_vectors, dimension = embedding_matrix.shape
+            index = self._create_index(dimension, n_vectors)
             
             # Normalize embeddings for cosine similarity
             faiss.normalize_L2(embedding_matrix)
             
+            # Quantized indices learn their codebooks from a random subsample
+            if not index.is_trained:
+                rng = np.random.default_rng(42)
+                n_train = min(n_vectors, index.nlist * 256 if isinstance(index, faiss.IndexIVF) else 65536)
+                index.train(embedding_matrix[rng.choice(n_vectors, n_train, replace=False)])
+            
             # Add embeddings to index
-            self.index.add(embedding_matrix)
+            index.add(embedding_matrix)
+            
+            # Swap the finished index in, so concurrent searches never see a partial one
+            with self._lock:
+                self.index = index
+                self.sequence_ids = list(valid_ids)
             
-            self.embeddings = embedding_matrix
-            self.sequence_ids = list(valid_ids)
+            # The index holds the vectors; only their shape is kept alongside it
+            self.embeddings_shape = embedding_matrix.shape
             
             logger.info(f"Built FAISS index with {len(valid_ids)} sequences")
             return True
@@ -198,33 +463,118 @@ class SimilaritySearcher:
             logger.error(f"Error building FAISS index: {e}")
             return False
     
+    def add_embeddings(self, embeddings: np.ndarray, sequence_ids: List[str]) -> bool:
+        """Add new (N, d) embeddings to the index, building it if there is none yet"""
+        import faiss
+        
+        if not len(sequence_ids):
+            return True
+        if self.index is None:
+            return self.build_index(list(embeddings), sequence_ids)
+        
+        try:
+            embedding_matrix = np.array(embeddings, dtype=np.float32, ndmin=2)
+            faiss.normalize_L2(embedding_matrix)
+            with self._lock:
+                self.index.add(embedding_matrix)
+                self.sequence_ids.extend(sequence_ids)
+            
+            n_vectors = self.embeddings_shape[0] + embedding_matrix.shape[0]
+            self.embeddings_shape = (n_vectors, embedding_matrix.shape[1])
+            
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error adding embeddings to FAISS index: {e}")
+            return False
+    
+    def _create_index(self, dimension: int, n_vectors: int):
+        """Create an empty inner-product (cosine similarity) index of the configured type"""
+        import faiss
+        
+        index_type = settings.faiss_index_type
+        
+        # Product quantization needs at least 256 training points per codebook
+        if index_type == "ivfpq" and n_vectors < 256:
+            logger.warning(f"Too few vectors ({n_vectors}) for IVF-PQ, using a flat index")
+            index_type = "flat"
+        
+        if index_type == "flat":
+            return faiss.IndexFlatIP(dimension)
+        
+        if index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = 200
+            return index
+        
+        if index_type == "sq8":
+            # int8 codes per dimension: a quarter of the memory, scored with int8 arithmetic
+            return faiss.IndexScalarQuantizer(
+                dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+            )
+        
+        if index_type == "ivfpq":
+            # ~39 training points per list keeps k-means well conditioned
+            nlist = min(1024, max(1, n_vectors // 39))
+            n_subquantizers = next(m for m in (64, 48, 32, 16, 8, 4, 2, 1) if dimension % m == 0)
+            quantizer = faiss.IndexFlatIP(dimension)
+            return faiss.IndexIVFPQ(
+                quantizer, dimension, nlist, n_subquantizers, 8, faiss.METRIC_INNER_PRODUCT
+            )
+        
+        raise ValueError(f"Unsupported FAISS index type: {index_type}")
+    
     def search_similar(self, query_embedding: np.ndarray, k: int = 10) -> List[Dict[str, Any]]:
         """Search for similar sequences"""
+        if query_embedding is None:
+            return []
+        
+        query = np.array(query_embedding, dtype=np.float32, copy=True).reshape(1, -1)
+        results = self.search_similar_batch(query, k)
+        
+        return results[0] if results else []
+    
+    def search_similar_batch(self, query_embeddings: np.ndarray, k: int = 10) -> List[List[Dict[str, Any]]]:
+        """Search for similar sequences for a (N, d) batch of queries in one FAISS call"""
+        import faiss
+        
         try:
             if self.index is None:
                 logger.error("No index built for similarity search")
                 return []
             
-            if query_embedding is None:
-                return []
-            
-            # Prepare query
-            query = query_embedding.reshape(1, -1).astype(np.float32)
-            faiss.normalize_L2(query)
-            
-            # Search
-            scores, indices = self.index.search(query, k)
-            
-            results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < len(self.sequence_ids):
-                    results.append({
-                        "sequence_id": self.sequence_ids[idx],
-                        "similarity_score": float(score),
-                        "index": int(idx)
-                    })
-            
-            return results
+            # Prepare queries; normalization happens in place, so work on a copy of the caller's array
+            queries = np.array(query_embeddings, dtype=np.float32, order='C', copy=True)
+            if queries.ndim != 2 or queries.shape[1] != self.index.d:
+                raise ValueError(
+                    f"Expected queries of shape (N, {self.index.d}), got {queries.shape}"
+                )
+            faiss.normalize_L2(queries)
+            
+            with self._lock:
+                # Widen the HNSW beam so approximate search keeps high recall
+                if isinstance(self.index, faiss.IndexHNSW):
+                    self.index.hnsw.efSearch = max(k * 4, 64)
+                elif isinstance(self.index, faiss.IndexIVF):
+                    self.index.nprobe = min(self.index.nlist, 16)
+                
+                # Search all queries at once; FAISS parallelizes across them with OpenMP
+                scores, indices = self.index.search(queries, k)
+                sequence_ids = self.sequence_ids
+            
+            batch_results = []
+            for query_scores, query_indices in zip(scores, indices):
+                results = []
+                for score, idx in zip(query_scores, query_indices):
+                    if 0 <= idx < len(sequence_ids):
+                        results.append({
+                            "sequence_id": sequence_ids[idx],
+                            "similarity_score": float(score),
+                            "index": int(idx)
+                        })
+                batch_results.append(results)
+            
+            return batch_results
             
         except Exception as e:
             logger.error(f"Error searching similar sequences: {e}")
@@ -232,6 +582,10 @@ class SimilaritySearcher:
     
     def save_index(self, index_id: str) -> bool:
         """Save FAISS index to MinIO"""
+        import faiss
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
         try:
             if self.index is None:
                 logger.error("No index to save")
@@ -241,26 +595,38 @@ class SimilaritySearcher:
             index_data = faiss.serialize_index(self.index)
             
             # Save index
-            index_success = self.minio_client.upload_file(
+            index_success = get_minio_client().upload_file(
                 settings.minio_bucket_models,
                 f"faiss_indices/{index_id}.index",
                 io.BytesIO(index_data),
                 content_type="application/octet-stream"
             )
             
-            # Save metadata
+            # Save sequence ids as a dictionary-encoded, zstd-compressed Parquet column
+            ids_buffer = io.BytesIO()
+            pq.write_table(
+                pa.table({"seq_id": pa.array(self.sequence_ids, type=pa.string())}),
+                ids_buffer, compression="zstd"
+            )
+            ids_success = get_minio_client().upload_file(
+                settings.minio_bucket_models,
+                f"faiss_indices/{index_id}_ids.parquet",
+                ids_buffer,
+                content_type="application/vnd.apache.parquet"
+            )
+            
+            # Save the remaining metadata
             metadata = {
-                "sequence_ids": self.sequence_ids,
-                "embeddings_shape": self.embeddings.shape if self.embeddings is not None else None
+                "embeddings_shape": self.embeddings_shape
             }
             
-            metadata_success = self.minio_client.upload_json(
+            metadata_success = get_minio_client().upload_json(
                 settings.minio_bucket_models,
                 f"faiss_indices/{index_id}_metadata.json",
                 metadata
             )
             
-            return index_success and metadata_success
+            return index_success and ids_success and metadata_success
             
         except Exception as e:
             logger.error(f"Error saving FAISS index: {e}")
@@ -268,9 +634,13 @@ class SimilaritySearcher:
     
     def load_index(self, index_id: str) -> bool:
         """Load FAISS index from MinIO"""
+        import faiss
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
         try:
             # Load index
-            index_data = self.minio_client.download_file(
+            index_data = get_minio_client().download_file(
                 settings.minio_bucket_models,
                 f"faiss_indices/{index_id}.index"
             )
@@ -279,15 +649,29 @@ class SimilaritySearcher:
                 logger.error(f"FAISS index {index_id} not found")
                 return False
             
-            self.index = faiss.deserialize_index(index_data)
+            # Wrap the downloaded bytes without copying them again
+            self.index = faiss.deserialize_index(np.frombuffer(index_data, dtype=np.uint8))
             
             # Load metadata
-            metadata = self.minio_client.download_json(
+            metadata = get_minio_client().download_json(
                 settings.minio_bucket_models,
                 f"faiss_indices/{index_id}_metadata.json"
             )
             
             if metadata:
+                self.embeddings_shape = metadata.get("embeddings_shape")
+            
+            ids_data = get_minio_client().download_file(
+                settings.minio_bucket_models,
+                f"faiss_indices/{index_id}_ids.parquet"
+            )
+            
+            if ids_data is not None:
+                # BufferReader reads the Parquet footer and pages without copying the bytes
+                table = pq.read_table(pa.BufferReader(ids_data))
+                self.sequence_ids = table.column("seq_id").to_pylist()
+            elif metadata:
+                # Indices saved before ids moved to Parquet keep them in the JSON metadata
                 self.sequence_ids = metadata.get("sequence_ids", [])
             
             return True
@@ -297,16 +681,77 @@ class SimilaritySearcher:
             return False
 
 
-# Global instances
-sequence_clusterer = SequenceClusterer()
-similarity_searcher = SimilaritySearcher()
+class SimilarityBatcher:
+    """Coalesces concurrent similarity queries into batched FAISS searches"""
+    
+    def __init__(self, searcher: SimilaritySearcher, window_seconds: float = 0.005):
+        self.searcher = searcher
+        self.window_seconds = window_seconds
+        self._pending = []
+        self._flush_handle = None
+        self._flush_tasks = set()
+    
+    async def search(self, query_embedding: np.ndarray, k: int = 10) -> List[Dict[str, Any]]:
+        """Queue a query and wait for the batch it is dispatched with"""
+        if query_embedding is None:
+            return []
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        self._pending.append((query, k, future))
+        
+        # The first query of a window schedules the flush for the whole window
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._start_flush)
+        
+        return await future
+    
+    def _start_flush(self):
+        """Hand the queued queries to a flush task, keeping a reference until it finishes"""
+        pending, self._pending = self._pending, []
+        self._flush_handle = None
+        
+        task = asyncio.ensure_future(self._flush(pending))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _flush(self, pending: list):
+        """Run the queued queries as one batch and resolve their futures"""
+        try:
+            k = max(query_k for _, query_k, _ in pending)
+            # The FAISS search blocks, so it runs on a worker thread instead of the event loop
+            batch_results = await asyncio.to_thread(
+                self.searcher.search_similar_batch,
+                np.vstack([query for query, _, _ in pending]), k
+            )
+        except Exception as e:
+            logger.error(f"Error batching similarity queries: {e}")
+            batch_results = []
+        
+        if len(batch_results) != len(pending):
+            batch_results = [[] for _ in pending]
+        
+        for (_, query_k, future), results in zip(pending, batch_results):
+            if not future.done():
+                future.set_result(results[:query_k])
 
 
+@lru_cache(maxsize=None)
 def get_sequence_clusterer() -> SequenceClusterer:
-    """Get the global sequence clusterer instance"""
-    return sequence_clusterer
+    """Get the global sequence clusterer instance, creating it on first use"""
+    return SequenceClusterer()
 
 
+@lru_cache(maxsize=None)
 def get_similarity_searcher() -> SimilaritySearcher:
-    """Get the global similarity searcher instance"""
-    return similarity_searcher
\ No newline at end of file
+    """Get the global similarity searcher instance, creating it on first use"""
+    return SimilaritySearcher()
+
+
+@lru_cache(maxsize=None)
+def get_similarity_batcher() -> SimilarityBatcher:
+    """Get the global similarity query batcher instance, creating it on first use"""
+    return SimilarityBatcher(
+        get_similarity_searcher(), window_seconds=settings.similarity_batch_window_ms / 1000
+    )
@@ -1,14 +1,82 @@
+import os
+import tempfile
+from functools import lru_cache
 import torch
 import numpy as np
 from transformers import AutoTokenizer, AutoModel
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from app.core.config import get_settings
+from app.core.kmer import kmer_string
 from app.core.utils import get_minio_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Maps A/C/G/T in either case to the uppercase byte; every other byte maps to 0
+ACGT_UPPER = np.zeros(256, dtype=np.uint8)
+for _base in b"ACGT":
+    ACGT_UPPER[_base] = _base
+    ACGT_UPPER[_base + 32] = _base
+
+
+def _encode(sequence: str) -> np.ndarray:
+    """Map a sequence to uppercase ACGT bytes, with 0 marking anything else"""
+    return ACGT_UPPER[np.frombuffer(sequence.encode('ascii', 'ignore'), dtype=np.uint8)]
+
+
+# Sequences are cleaned and counted several times along the pipeline; str hashes are
+# cached by Python, so repeat lookups cost one dict probe instead of a rescan
+def _clean_bytes(sequence: str) -> np.ndarray:
+    """Uppercase ATCG bytes of a sequence, everything else filtered out"""
+    encoded = _encode(sequence)
+    return encoded[encoded != 0]
+
+
+@lru_cache(maxsize=4096)
+def _clean(sequence: str) -> str:
+    """Uppercase and keep only ATCG (whitespace and other characters are dropped)"""
+    return _clean_bytes(sequence).tobytes().decode('ascii')
+
+
+@lru_cache(maxsize=4096)
+def _base_counts(sequence: str) -> Tuple[int, int, int, int]:
+    """A, T, C and G counts of the normalized sequence, from one bincount pass"""
+    counts = np.bincount(_encode(sequence), minlength=256)
+    return tuple(int(counts[ord(base)]) for base in "ATCG")
+
+
+def _segment_sums(mask: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Per-segment count of True entries, from one cumulative sum (empty segments give 0)"""
+    totals = np.zeros(mask.shape[0] + 1, dtype=np.int64)
+    np.cumsum(mask, out=totals[1:])
+    return totals[offsets[1:]] - totals[offsets[:-1]]
+
+
+def _batch_stats(sequences: List[str]) -> Dict[str, Any]:
+    """Clean and count many sequences over a single concatenated byte buffer"""
+    encoded = [sequence.encode('ascii', 'ignore') for sequence in sequences]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(seq) for seq in encoded], out=offsets[1:])
+    
+    codes = ACGT_UPPER[np.frombuffer(b"".join(encoded), dtype=np.uint8)]
+    kept = codes != 0
+    lengths = _segment_sums(kept, offsets)
+    gc = _segment_sums((codes == ord('G')) | (codes == ord('C')), offsets)
+    
+    # Cleaned sequences are slices of one decoded string
+    clean_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=clean_offsets[1:])
+    cleaned = codes[kept].tobytes().decode('ascii')
+    
+    return {
+        "cleaned": [cleaned[clean_offsets[i]:clean_offsets[i + 1]] for i in range(len(encoded))],
+        "length": lengths,
+        "original_length": np.fromiter((len(seq.strip()) for seq in sequences), dtype=np.int64,
+                                       count=len(sequences)),
+        "gc_content": np.divide(gc, lengths, out=np.zeros(len(encoded)), where=lengths > 0)
+    }
+
 
 class DNAPreprocessor:
     """Handles DNA sequence preprocessing and quality control"""
@@ -20,45 +88,65 @@ class DNAPreprocessor:
     
     def clean_sequence(self, sequence: str) -> str:
         """Clean and normalize DNA sequence"""
-        # Convert to uppercase and remove whitespace
-        sequence = sequence.upper().strip()
-        
-        # Remove non-DNA characters (keep only ATCG)
-        cleaned = ''.join(c for c in sequence if c in self.valid_bases)
-        
-        return cleaned
+        return _clean(sequence)
     
     def validate_sequence(self, sequence: str) -> tuple[bool, str]:
         """Validate DNA sequence quality"""
-        cleaned = self.clean_sequence(sequence)
+        # Only the cleaned length is needed, and the (cached) base counts already give it
+        cleaned_length = sum(_base_counts(sequence))
         
-        if len(cleaned) < self.min_length:
-            return False, f"Sequence too short: {len(cleaned)} < {self.min_length}"
+        if cleaned_length < self.min_length:
+            return False, f"Sequence too short: {cleaned_length} < {self.min_length}"
         
-        if len(cleaned) > self.max_length:
-            return False, f"Sequence too long: {len(cleaned)} > {self.max_length}"
+        if cleaned_length > self.max_length:
+            return False, f"Sequence too long: {cleaned_length} > {self.max_length}"
         
         # Check for too many ambiguous bases
-        original_length = len(sequence.upper().strip())
-        if len(cleaned) / original_length < 0.8:
+        original_length = len(sequence.strip())
+        if cleaned_length / original_length < 0.8:
             return False, "Too many ambiguous bases (>20%)"
         
         return True, "Valid"
     
+    def preprocess_batch(self, sequences: List[str]) -> List[Tuple[bool, str, str, float]]:
+        """Validate, clean and GC-count many sequences in one vectorized pass.
+        
+        Returns (is_valid, message, cleaned_sequence, gc_content) per sequence, with the
+        same rules as validate_sequence.
+        """
+        stats = _batch_stats(sequences)
+        results = []
+        for cleaned, length, original_length, gc_content in zip(
+                stats["cleaned"], stats["length"], stats["original_length"], stats["gc_content"]):
+            if length < self.min_length:
+                message = f"Sequence too short: {length} < {self.min_length}"
+            elif length > self.max_length:
+                message = f"Sequence too long: {length} > {self.max_length}"
+            elif length / original_length < 0.8:
+                message = "Too many ambiguous bases (>20%)"
+            else:
+                results.append((True, "Valid", cleaned, float(gc_content)))
+                continue
+            results.append((False, message, cleaned, float(gc_content)))
+        
+        return results
+    
     def get_gc_content(self, sequence: str) -> float:
         """Calculate GC content of sequence"""
-        cleaned = self.clean_sequence(sequence)
-        if not cleaned:
+        a, t, c, g = _base_counts(sequence)
+        total = a + t + c + g
+        if not total:
             return 0.0
         
-        gc_count = cleaned.count('G') + cleaned.count('C')
-        return gc_count / len(cleaned)
+        return (g + c) / total
     
     def get_sequence_stats(self, sequence: str) -> Dict[str, Any]:
         """Get comprehensive sequence statistics"""
-        cleaned = self.clean_sequence(sequence)
+        # Build a fresh dict per call so callers can't mutate the cached counts
+        base_counts = dict(zip("ATCG", _base_counts(sequence)))
+        length = sum(base_counts.values())
         
-        if not cleaned:
+        if not length:
             return {
                 "length": 0,
                 "gc_content": 0.0,
@@ -66,30 +154,51 @@ class DNAPreprocessor:
                 "valid": False
             }
         
-        base_counts = {
-            "A": cleaned.count('A'),
-            "T": cleaned.count('T'),
-            "C": cleaned.count('C'),
-            "G": cleaned.count('G')
-        }
-        
         return {
-            "length": len(cleaned),
-            "gc_content": self.get_gc_content(sequence),
+            "length": length,
+            "gc_content": (base_counts["G"] + base_counts["C"]) / length,
             "base_counts": base_counts,
             "valid": True
         }
 
 
+class PooledEmbedder(torch.nn.Module):
+    """Runs a transformer and mean-pools its non-padding token states in one forward.
+
+    Keeping the pool inside the module lets torch.compile, ONNX export and CUDA graph
+    capture treat forward and pooling as a single unit.
+    """
+    
+    def __init__(self, backbone: torch.nn.Module):
+        super().__init__()
+        self.backbone = backbone
+    
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        # Pool in fp32 so long sequences don't lose precision in the token sum
+        hidden = self.backbone(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state.float()
+        mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+        return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp_min(1)
+
+
 class DNAEmbedder:
     """Generates embeddings for DNA sequences using pre-trained models"""
     
     def __init__(self):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.dtype = torch.float32
         self.model_name = "microsoft/DialoGPT-medium"  # Placeholder - use actual DNA model
         self.tokenizer = None
         self.model = None
-        self.minio_client = get_minio_client()
+        self._pooled = None
+        self._ort_session = None
+        self._int8 = False
+        # CUDA graphs keyed by (batch, padded length), and how often each shape was seen
+        self._graphs: Dict[Tuple[int, int], Tuple[Any, torch.Tensor, torch.Tensor, torch.Tensor]] = {}
+        self._shape_counts: Dict[Tuple[int, int], int] = {}
+        self._graph_failed: set = set()  # shapes whose capture failed; these always run eagerly
+        # Reusable pinned host buffers (double-buffered) and a side stream for host-to-device copies
+        self._pinned: Dict[Tuple[str, int], torch.Tensor] = {}
+        self._copy_stream = torch.cuda.Stream() if self.device.type == "cuda" else None
         self._load_model()
     
     def _load_model(self):
@@ -97,94 +206,334 @@ class DNAEmbedder:
         try:
             # Check if model exists in MinIO first
             model_path = "dna_embedder/model"
-            if self.minio_client.file_exists(settings.minio_bucket_models, f"{model_path}/config.json"):
+            if get_minio_client().file_exists(settings.minio_bucket_models, f"{model_path}/config.json"):
                 logger.info("Loading model from MinIO storage...")
                 # In production, implement model loading from MinIO
                 # For now, use HuggingFace transformers
             
             logger.info(f"Loading DNA embedding model: {self.model_name}")
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModel.from_pretrained(self.model_name)
+            if self.tokenizer.pad_token is None:
+                # Batched inputs need a pad token; pooling masks it out anyway
+                self.tokenizer.pad_token = self.tokenizer.eos_token
+            
+            if self.device.type == "cuda":
+                # Half-precision weights halve memory traffic; bf16 keeps fp32's range on Ampere+
+                self.dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+            
+            try:
+                # Fused scaled-dot-product attention, where the architecture supports it
+                self.model = AutoModel.from_pretrained(
+                    self.model_name, attn_implementation="sdpa", torch_dtype=self.dtype
+                )
+            except (ValueError, ImportError) as e:
+                logger.warning(f"SDPA attention unavailable for {self.model_name}, using default: {e}")
+                self.model = AutoModel.from_pretrained(self.model_name, torch_dtype=self.dtype)
             self.model.to(self.device)
             self.model.eval()
             
+            if settings.embedding_use_onnx:
+                self._load_onnx_session()
+            
+            if settings.embedding_quantize_int8 and self.device.type == "cpu" and self._ort_session is None:
+                # int8 weights quarter Linear-layer memory traffic and use VNNI dot products via oneDNN
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                self._int8 = True
+                logger.info("Quantized embedding model Linear layers to int8")
+            
+            self._pooled = PooledEmbedder(self.model)
+            if settings.embedding_compile and self._ort_session is None:
+                # reduce-overhead also captures CUDA graphs, so the manual capture path is skipped
+                self._pooled = torch.compile(self._pooled, mode="reduce-overhead")
+            
         except Exception as e:
             logger.error(f"Error loading embedding model: {e}")
             raise
     
-    def _tokenize_dna(self, sequence: str, max_length: int = 512) -> Dict[str, torch.Tensor]:
-        """Tokenize DNA sequence for model input"""
-        # Simple k-mer tokenization approach
-        k = 6  # 6-mer tokenization
-        kmers = []
+    @property
+    def cache_id(self) -> str:
+        """Embedding cache key for this model: fp16/int8 weights and ONNX give slightly different vectors"""
+        backend = "onnx" if self._ort_session is not None else "torch"
+        weights = "int8" if self._int8 else str(self.dtype).replace("torch.", "")
+        return f"{self.model_name}:{backend}:{weights}"
+    
+    def _load_onnx_session(self):
+        """Export the model to ONNX (cached in MinIO) and open an ONNX Runtime session"""
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            logger.warning("onnxruntime is not available, using PyTorch for embeddings")
+            return
         
-        for i in range(len(sequence) - k + 1):
-            kmer = sequence[i:i+k]
-            kmers.append(kmer)
+        # Exports differ by weight dtype and the device they were traced on
+        variant = f"{str(self.dtype).replace('torch.', '')}_{self.device.type}"
+        object_name = f"dna_embedder/onnx/{self.model_name.replace('/', '__')}_{variant}_pooled.onnx"
+        local_path = os.path.join(tempfile.gettempdir(), object_name.replace('/', '_'))
         
-        # Join k-mers with spaces for tokenizer
-        kmer_string = " ".join(kmers[:max_length//k])
+        try:
+            if not os.path.exists(local_path):
+                onnx_bytes = get_minio_client().download_file(settings.minio_bucket_models, object_name)
+                if onnx_bytes is None:
+                    self._export_onnx(local_path)
+                    with open(local_path, 'rb') as f:
+                        get_minio_client().upload_file(settings.minio_bucket_models, object_name, f)
+                else:
+                    with open(local_path, 'wb') as f:
+                        f.write(onnx_bytes)
+            
+            providers = [
+                provider for provider in ("CUDAExecutionProvider", "CPUExecutionProvider")
+                if provider in ort.get_available_providers()
+            ]
+            self._ort_session = ort.InferenceSession(local_path, providers=providers)
+            logger.info(f"Serving embeddings through ONNX Runtime ({providers[0]})")
+            
+        except Exception as e:
+            logger.warning(f"ONNX export/load failed, using PyTorch for embeddings: {e}")
+            self._ort_session = None
+    
+    def _export_onnx(self, path: str):
+        """Trace the pooled model with dynamic batch and sequence axes"""
+        dummy = self._tokenize_dna_batch(["ACGT" * 16])
+        args = (dummy["input_ids"].to(self.device), dummy["attention_mask"].to(self.device))
+        dynamic_axes = {"input_ids": {0: "batch", 1: "sequence"},
+                        "attention_mask": {0: "batch", 1: "sequence"},
+                        "embeddings": {0: "batch"}}
         
+        with torch.inference_mode():
+            torch.onnx.export(
+                PooledEmbedder(self.model), args, path,
+                input_names=["input_ids", "attention_mask"],
+                output_names=["embeddings"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17
+            )
+    
+    def _kmer_string(self, sequence: str, max_length: int = 512) -> str:
+        """Split a DNA sequence into space-separated 6-mers for the tokenizer"""
+        k = 6  # 6-mer tokenization
+        return kmer_string(sequence, k, max_length // k)
+    
+    def _tokenize_dna(self, sequence: str, max_length: int = 512) -> Dict[str, torch.Tensor]:
+        """Tokenize DNA sequence for model input"""
+        return self._tokenize_dna_batch([sequence], max_length)
+    
+    def _tokenize_dna_batch(self, sequences: List[str], max_length: int = 512) -> Dict[str, torch.Tensor]:
+        """Tokenize a batch of DNA sequences in one tokenizer call, padded to the longest"""
         return self.tokenizer(
-            kmer_string,
+            [self._kmer_string(seq, max_length) for seq in sequences],
             return_tensors="pt",
             padding=True,
             truncation=True,
-            max_length=max_length
+            max_length=max_length,
+            # Rounding the padded length keeps the set of shapes small enough to capture as graphs
+            pad_to_multiple_of=64 if self._use_cuda_graphs() else None
         )
     
+    def _use_cuda_graphs(self) -> bool:
+        return (settings.embedding_cuda_graphs and not settings.embedding_compile
+                and self.device.type == "cuda" and self._ort_session is None)
+    
+    def _stage(self, sequences: List[str], slot: int = 0) -> Dict[str, torch.Tensor]:
+        """Tokenize a batch and start copying it to the GPU through pinned buffer `slot`"""
+        inputs = self._tokenize_dna_batch(sequences)
+        if self._copy_stream is None or self._ort_session is not None:
+            return inputs
+        
+        staged = {}
+        with torch.cuda.stream(self._copy_stream):
+            for name, tensor in inputs.items():
+                # Grow-only pinned buffer per input and slot; pinning fresh memory every batch is slow
+                buffer = self._pinned.get((name, slot))
+                if buffer is None or buffer.numel() < tensor.numel() or buffer.dtype != tensor.dtype:
+                    buffer = torch.empty(tensor.numel(), dtype=tensor.dtype, pin_memory=True)
+                    self._pinned[(name, slot)] = buffer
+                
+                host = buffer[:tensor.numel()].view(tensor.shape)
+                host.copy_(tensor)
+                staged[name] = host.to(self.device, non_blocking=True)
+        
+        return staged
+    
+    def _forward_staged(self, inputs: Dict[str, torch.Tensor]) -> torch.Tensor:
+        """Launch the forward pass for staged inputs and return the pooled embeddings"""
+        if self._ort_session is not None:
+            pooled = self._ort_session.run(None, {
+                "input_ids": inputs["input_ids"].numpy(),
+                "attention_mask": inputs["attention_mask"].numpy()
+            })[0]
+            return torch.from_numpy(pooled)
+        
+        if self._copy_stream is not None:
+            # Compute must not start before the copy lands; tell the allocator who uses the tensors
+            current = torch.cuda.current_stream()
+            current.wait_stream(self._copy_stream)
+            for tensor in inputs.values():
+                tensor.record_stream(current)
+        else:
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        with torch.inference_mode():
+            if self._use_cuda_graphs():
+                pooled = self._graph_forward(inputs["input_ids"], inputs["attention_mask"])
+                if pooled is not None:
+                    return pooled
+            
+            with torch.autocast(device_type=self.device.type, dtype=self.dtype,
+                                enabled=self.dtype != torch.float32):
+                return self._pooled(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"])
+    
+    def _embed_batch(self, sequences: List[str]) -> np.ndarray:
+        """Run one pooled forward pass over a batch"""
+        return self._forward_staged(self._stage(sequences)).cpu().numpy()
+    
+    def _pooled_forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        """Forward plus pooling, the unit captured into a CUDA graph"""
+        # Autocast's weight-cast cache must be off while capturing
+        with torch.autocast(device_type="cuda", dtype=self.dtype,
+                            enabled=self.dtype != torch.float32, cache_enabled=False):
+            return self._pooled(input_ids=input_ids, attention_mask=attention_mask)
+    
+    def _graph_forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> Optional[torch.Tensor]:
+        """Replay a captured CUDA graph for this batch shape; None means run eagerly"""
+        shape = tuple(input_ids.shape)
+        if shape in self._graph_failed:
+            return None
+        self._shape_counts[shape] = self._shape_counts.get(shape, 0) + 1
+        
+        try:
+            if shape not in self._graphs:
+                # Only capture shapes that recur, and bound the memory held by static buffers
+                if self._shape_counts[shape] < 2 or len(self._graphs) >= 16:
+                    return None
+                
+                static_ids = input_ids.clone()
+                static_mask = attention_mask.clone()
+                
+                # Warm up on a side stream so lazy initialization stays out of the capture
+                stream = torch.cuda.Stream()
+                stream.wait_stream(torch.cuda.current_stream())
+                with torch.cuda.stream(stream):
+                    for _ in range(3):
+                        self._pooled_forward(static_ids, static_mask)
+                torch.cuda.current_stream().wait_stream(stream)
+                
+                graph = torch.cuda.CUDAGraph()
+                with torch.cuda.graph(graph):
+                    static_out = self._pooled_forward(static_ids, static_mask)
+                self._graphs[shape] = (graph, static_ids, static_mask, static_out)
+            
+            graph, static_ids, static_mask, static_out = self._graphs[shape]
+            static_ids.copy_(input_ids)
+            static_mask.copy_(attention_mask)
+            graph.replay()
+            
+            return static_out.clone()
+            
+        except Exception as e:
+            # e.g. a host sync inside the model (attention mask checks) breaks capture;
+            # remember the shape so the batch and every later one of this shape run eagerly
+            self._graphs.pop(shape, None)
+            self._graph_failed.add(shape)
+            logger.warning(f"CUDA graph capture failed for shape {shape}, running it eagerly: {e}")
+            return None
+    
     def generate_embedding(self, sequence: str) -> Optional[np.ndarray]:
         """Generate embedding vector for DNA sequence"""
         try:
             if not sequence:
                 return None
             
-            # Tokenize sequence
-            inputs = self._tokenize_dna(sequence)
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Generate embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                # Use mean pooling of last hidden states
-                embeddings = outputs.last_hidden_state.mean(dim=1)
-                
-            return embeddings.cpu().numpy().flatten()
+            return self._embed_batch([sequence])[0]
             
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             return None
     
-    def generate_batch_embeddings(self, sequences: List[str], batch_size: int = 32) -> List[Optional[np.ndarray]]:
-        """Generate embeddings for multiple sequences in batches"""
-        embeddings = []
+    def _length_batches(self, sequences: List[str], batch_size: int,
+                        token_budget: int) -> List[List[int]]:
+        """Group non-empty sequence indices by token count under a padded token budget"""
+        indices = [i for i, seq in enumerate(sequences) if seq]
+        if not indices:
+            return []
         
-        for i in range(0, len(sequences), batch_size):
-            batch = sequences[i:i+batch_size]
-            batch_embeddings = []
-            
-            for seq in batch:
-                embedding = self.generate_embedding(seq)
-                batch_embeddings.append(embedding)
+        # Count what the model sees: truncated tokens plus special tokens (the k-mer
+        # strings are cached, so staging the batches later does not rebuild them)
+        n_tokens = self.tokenizer(
+            [self._kmer_string(sequences[i]) for i in indices],
+            truncation=True, max_length=512, return_length=True
+        )["length"]
+        pad_multiple = 64 if self._use_cuda_graphs() else 1
+        
+        batches = []
+        batch: List[int] = []
+        # Sorting by token count keeps each batch padded to a similar width
+        for length, i in sorted(zip(n_tokens, indices)):
+            # Sorted ascending, so the newest sequence sets the padded width
+            width = -(-length // pad_multiple) * pad_multiple
+            if batch and (len(batch) >= batch_size or (len(batch) + 1) * width > token_budget):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        
+        if batch:
+            batches.append(batch)
+        
+        return batches
+    
+    def generate_batch_embeddings(self, sequences: List[str], batch_size: int = 32,
+                                  token_budget: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        """Generate embeddings for multiple sequences in length-sorted batches"""
+        embeddings: List[Optional[np.ndarray]] = [None] * len(sequences)
+        # Empty sequences get no embedding, matching generate_embedding
+        batches = self._length_batches(
+            sequences, batch_size, token_budget or settings.embedding_token_budget
+        )
+        
+        processed = 0
+        staged = None
+        for n, batch_indices in enumerate(batches):
+            try:
+                if staged is None:
+                    staged = self._stage([sequences[i] for i in batch_indices], n % 2)
+                pooled = self._forward_staged(staged)
+                staged = None
+                
+                # Tokenize and upload the next batch while the GPU works on this one;
+                # alternating pinned slots keeps it from overwriting a copy in flight
+                if n + 1 < len(batches):
+                    try:
+                        staged = self._stage([sequences[i] for i in batches[n + 1]], (n + 1) % 2)
+                    except Exception as e:
+                        # Not this batch's failure; the next batch is staged again on its turn
+                        logger.warning(f"Error prefetching the next embedding batch: {e}")
+                
+                batch_embeddings = pooled.cpu().numpy()
+            except Exception as e:
+                logger.error(f"Error generating batch embeddings: {e}")
+                staged = None
+                continue
             
-            embeddings.extend(batch_embeddings)
+            # Scatter back to the caller's order
+            for i, embedding in zip(batch_indices, batch_embeddings):
+                embeddings[i] = embedding
             
-            if (i // batch_size + 1) % 10 == 0:
-                logger.info(f"Processed {i + len(batch)}/{len(sequences)} sequences")
+            processed += len(batch_indices)
+            if (n + 1) % 10 == 0:
+                logger.info(f"Processed {processed}/{len(sequences)} sequences")
         
         return embeddings
 
 
-# Global instances
-dna_preprocessor = DNAPreprocessor()
-dna_embedder = DNAEmbedder()
-
-
+@lru_cache(maxsize=None)
 def get_dna_preprocessor() -> DNAPreprocessor:
-    """Get the global DNA preprocessor instance"""
-    return dna_preprocessor
+    """Get the global DNA preprocessor instance, creating it on first use"""
+    return DNAPreprocessor()
 
 
+@lru_cache(maxsize=None)
 def get_dna_embedder() -> DNAEmbedder:
-    """Get the global DNA embedder instance"""
-    return dna_embedder
\ No newline at end of file
+    """Get the global DNA embedder instance, loading the model on first use"""
+    return DNAEmbedder()
@@ -1,49 +1,529 @@
+import asyncio
+import io
+import os
+import tempfile
+import threading
 import requests
 import json
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
+from typing import List, Dict, Any, NamedTuple, Optional
 import logging
 from app.core.config import get_settings
+from app.core.kmer import BASE_CODES, _rolling_kmers, kmer_hashes, seqs_to_padded
 from app.core.utils import get_minio_client
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+try:
+    from numba import njit, prange
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Without numba the kernels below run as plain Python"""
+        return lambda func: func
+
+
+# Bit masks for SWAR popcount and for the low bit of every 2-bit base slot
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _encode(sequence: str) -> np.ndarray:
+    """Encode a sequence as 2-bit base codes (A=0, C=1, G=2, T=3, anything else 255)"""
+    return BASE_CODES[np.frombuffer(sequence.encode('ascii', 'ignore'), dtype=np.uint8)]
+
+
+@njit(cache=True, nogil=True)
+def _pack2bit(codes: np.ndarray):
+    """Pack base codes 32 per uint64 word, with a parallel mask marking unambiguous bases"""
+    n_words = (codes.shape[0] + 31) // 32
+    packed = np.zeros(n_words, dtype=np.uint64)
+    valid = np.zeros(n_words, dtype=np.uint64)
+    
+    for i in range(codes.shape[0]):
+        code = codes[i]
+        if code == 255:
+            continue
+        shift = np.uint64(2 * (i & 31))
+        packed[i >> 5] |= np.uint64(code) << shift
+        valid[i >> 5] |= np.uint64(1) << shift
+    
+    return packed, valid
+
+
+@njit(cache=True, nogil=True)
+def _popcount64(x):
+    """Count set bits of a uint64 without relying on a hardware intrinsic"""
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+
+@njit(cache=True, nogil=True)
+def _similarity_kernel(a_packed: np.ndarray, a_valid: np.ndarray, a_len: int,
+                       b_packed: np.ndarray, b_valid: np.ndarray, b_len: int) -> float:
+    """Fraction of positions with the same base, over the longer sequence, 32 bases per step"""
+    matches = 0
+    for w in range(min(a_packed.shape[0], b_packed.shape[0])):
+        x = a_packed[w] ^ b_packed[w]
+        # Low bit of each slot is set where the two bases differ in either bit
+        mismatch = (x | (x >> np.uint64(1))) & _M1
+        # Slots past the shorter sequence or holding an ambiguous base have no valid bit
+        matches += _popcount64(a_valid[w] & b_valid[w] & ~mismatch)
+    
+    return matches / max(a_len, b_len)
+
+
+def _pack(sequence: str):
+    """Encode and pack a sequence for _similarity_kernel"""
+    codes = _encode(sequence)
+    packed, valid = _pack2bit(codes)
+    return packed, valid, codes.shape[0]
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _best_match(q_packed: np.ndarray, q_valid: np.ndarray, q_len: int,
+                ref_packed: np.ndarray, ref_valid: np.ndarray,
+                offsets: np.ndarray, ref_lens: np.ndarray, candidates: np.ndarray):
+    """Score the query against the candidate references in parallel and return the best"""
+    n_candidates = candidates.shape[0]
+    scores = np.empty(n_candidates, dtype=np.float64)
+    for c in prange(n_candidates):
+        i = candidates[c]
+        start = offsets[i]
+        end = offsets[i + 1]
+        scores[c] = _similarity_kernel(
+            q_packed, q_valid, q_len, ref_packed[start:end], ref_valid[start:end], ref_lens[i]
+        )
+    
+    # Candidates are in reference order, so a serial argmax keeps the first one on ties
+    best_idx = -1
+    best_sim = 0.0
+    for c in range(n_candidates):
+        if scores[c] > best_sim:
+            best_idx = candidates[c]
+            best_sim = scores[c]
+    
+    return best_idx, best_sim
+
+
+# Binary reference database layout in the models bucket: one .npy per flat index array,
+# plus Parquet reference metadata and the category taxonomy as JSON
+REFERENCE_DB_PREFIX = "taxonomy/reference_db"
+REFERENCE_DB_ARRAYS = ("packed", "valid", "offsets", "lens", "cat_idx", "sketches", "sketch_lens")
+
+# NCBI asks clients to keep concurrent requests low
+NCBI_CONCURRENCY = 5
+
+# Bottom-k MinHash sketch size and how many references survive the sketch prefilter
+SKETCH_SIZE = 128
+PREFILTER_CANDIDATES = 32
+_SENTINEL = np.uint64(0xFFFFFFFFFFFFFFFF)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+@njit(cache=True, nogil=True)
+def _splitmix64(x):
+    """splitmix64 finalizer, spreading packed k-mers uniformly over uint64"""
+    z = x + _GOLDEN
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    return z ^ (z >> np.uint64(31))
+
+
+@njit(cache=True, nogil=True)
+def _bottom_k(kmers: np.ndarray, out: np.ndarray) -> int:
+    """Write the smallest distinct k-mer hashes into out (sorted) and return how many"""
+    hashes = np.empty(kmers.shape[0], dtype=np.uint64)
+    for i in range(kmers.shape[0]):
+        hashes[i] = _splitmix64(np.uint64(kmers[i]))
+    hashes = np.unique(hashes)
+    
+    n = min(out.shape[0], hashes.shape[0])
+    out[:n] = hashes[:n]
+    out[n:] = _SENTINEL
+    return n
+
+
+@njit(cache=True, nogil=True)
+def _sketch_jaccard(a: np.ndarray, a_len: int, b: np.ndarray, b_len: int) -> float:
+    """Bottom-k Jaccard estimate: shared hashes among the k smallest of the union"""
+    k = a.shape[0]
+    i = 0
+    j = 0
+    seen = 0
+    shared = 0
+    while seen < k and i < a_len and j < b_len:
+        if a[i] == b[j]:
+            shared += 1
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+        seen += 1
+    
+    seen += min(k - seen, (a_len - i) + (b_len - j))
+    return shared / seen if seen else 0.0
+
+
+@njit(cache=True, nogil=True)
+def _top_candidates(q_sketch: np.ndarray, q_len: int, ref_sketches: np.ndarray,
+                    ref_sketch_lens: np.ndarray, n_candidates: int) -> np.ndarray:
+    """Indices (in reference order) of the references with the highest sketch Jaccard"""
+    n_refs = ref_sketches.shape[0]
+    if n_refs <= n_candidates or q_len == 0:
+        # Few references, or a query too short to sketch: compare against everything
+        return np.arange(n_refs)
+    
+    scores = np.empty(n_refs, dtype=np.float64)
+    for i in range(n_refs):
+        scores[i] = -_sketch_jaccard(q_sketch, q_len, ref_sketches[i], ref_sketch_lens[i])
+    
+    return np.sort(np.argsort(scores, kind='mergesort')[:n_candidates])
+
+
+@njit(cache=True, nogil=True)
+def _best_candidate(q_packed: np.ndarray, q_valid: np.ndarray, q_len: int,
+                    ref_packed: np.ndarray, ref_valid: np.ndarray,
+                    offsets: np.ndarray, ref_lens: np.ndarray, candidates: np.ndarray):
+    """Serial counterpart of _best_match, for use inside an outer parallel loop"""
+    best_idx = -1
+    best_sim = 0.0
+    for c in range(candidates.shape[0]):
+        i = candidates[c]
+        sim = _similarity_kernel(
+            q_packed, q_valid, q_len,
+            ref_packed[offsets[i]:offsets[i + 1]], ref_valid[offsets[i]:offsets[i + 1]], ref_lens[i]
+        )
+        if sim > best_sim:
+            best_idx = i
+            best_sim = sim
+    
+    return best_idx, best_sim
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _best_match_batch(q_packed: np.ndarray, q_valid: np.ndarray, q_offsets: np.ndarray,
+                      q_lens: np.ndarray, q_sketches: np.ndarray, q_sketch_lens: np.ndarray,
+                      ref_packed: np.ndarray, ref_valid: np.ndarray, ref_offsets: np.ndarray,
+                      ref_lens: np.ndarray, ref_sketches: np.ndarray, ref_sketch_lens: np.ndarray,
+                      n_candidates: int):
+    """Prefilter and score many queries at once, one query per parallel iteration"""
+    n_queries = q_lens.shape[0]
+    best_idx = np.full(n_queries, -1, dtype=np.int64)
+    best_sim = np.zeros(n_queries, dtype=np.float64)
+    
+    for q in prange(n_queries):
+        start = q_offsets[q]
+        end = q_offsets[q + 1]
+        candidates = _top_candidates(
+            q_sketches[q], q_sketch_lens[q], ref_sketches, ref_sketch_lens, n_candidates
+        )
+        idx, sim = _best_candidate(
+            q_packed[start:end], q_valid[start:end], q_lens[q],
+            ref_packed, ref_valid, ref_offsets, ref_lens, candidates
+        )
+        best_idx[q] = idx
+        best_sim[q] = sim
+    
+    return best_idx, best_sim
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _pack_sketch_batch(padded: np.ndarray, lengths: np.ndarray, k: int, lut: np.ndarray):
+    """Pack and sketch every row of a padded byte matrix, one row per parallel iteration"""
+    n_queries = padded.shape[0]
+    n_words = (padded.shape[1] + 31) // 32
+    packed = np.zeros((n_queries, n_words), dtype=np.uint64)
+    valid = np.zeros((n_queries, n_words), dtype=np.uint64)
+    sketches = np.empty((n_queries, SKETCH_SIZE), dtype=np.uint64)
+    sketch_lens = np.zeros(n_queries, dtype=np.int64)
+    
+    for q in prange(n_queries):
+        row = padded[q, :lengths[q]]
+        row_packed, row_valid = _pack2bit(lut[row])
+        packed[q, :row_packed.shape[0]] = row_packed
+        valid[q, :row_valid.shape[0]] = row_valid
+        
+        kmers = np.empty(row.shape[0], dtype=np.uint32)
+        n_kmers = _rolling_kmers(row, k, lut, kmers)
+        sketch_lens[q] = _bottom_k(kmers[:n_kmers], sketches[q])
+    
+    return packed, valid, sketches, sketch_lens
+
+
+if not _NUMBA_AVAILABLE:
+    # NumPy versions of the per-base and per-hash loops, which are too slow interpreted;
+    # the per-candidate and per-query loops above call these in place of the kernels
+    def _pack2bit(codes: np.ndarray):
+        """Pack base codes 32 per uint64 word, with a parallel mask marking unambiguous bases"""
+        n_words = (codes.shape[0] + 31) // 32
+        slots = np.full(n_words * 32, 255, dtype=np.uint8)
+        slots[:codes.shape[0]] = codes
+        slots = slots.reshape(n_words, 32)
+        unambiguous = slots != 255
+        
+        # Slots never overlap, so summing the shifted codes packs them
+        shifts = np.arange(0, 64, 2, dtype=np.uint64)
+        packed = (np.where(unambiguous, slots, 0).astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+        valid = (unambiguous.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+        return packed, valid
+    
+    def _similarity_kernel(a_packed: np.ndarray, a_valid: np.ndarray, a_len: int,
+                           b_packed: np.ndarray, b_valid: np.ndarray, b_len: int) -> float:
+        """Fraction of positions with the same base, over the longer sequence, all words at once"""
+        n_words = min(a_packed.shape[0], b_packed.shape[0])
+        x = a_packed[:n_words] ^ b_packed[:n_words]
+        mismatch = (x | (x >> np.uint64(1))) & _M1
+        matches = int(_popcount64(a_valid[:n_words] & b_valid[:n_words] & ~mismatch).sum())
+        return matches / max(a_len, b_len)
+    
+    def _bottom_k(kmers: np.ndarray, out: np.ndarray) -> int:
+        """Write the smallest distinct k-mer hashes into out (sorted) and return how many"""
+        hashes = np.unique(_splitmix64(kmers.astype(np.uint64)))
+        n = min(out.shape[0], hashes.shape[0])
+        out[:n] = hashes[:n]
+        out[n:] = _SENTINEL
+        return n
+    
+    def _sketch_jaccard(a: np.ndarray, a_len: int, b: np.ndarray, b_len: int) -> float:
+        """Bottom-k Jaccard estimate: shared hashes among the k smallest of the union"""
+        union = np.union1d(a[:a_len], b[:b_len])[:a.shape[0]]
+        if not union.shape[0]:
+            return 0.0
+        shared = np.isin(union, a[:a_len]) & np.isin(union, b[:b_len])
+        return int(shared.sum()) / union.shape[0]
+
+
+def _sketch(sequence: str, k: int = 6):
+    """Bottom-k MinHash sketch of a sequence's k-mers"""
+    sketch = np.empty(SKETCH_SIZE, dtype=np.uint64)
+    n = _bottom_k(kmer_hashes(sequence, k), sketch)
+    return sketch, n
+
+
+def _row_string(padded: np.ndarray, lengths: np.ndarray, i: int) -> str:
+    """Decode row i of a padded batch back to its sequence"""
+    return padded[i, :lengths[i]].tobytes().decode('ascii')
+
+
+def _row_strings(padded: np.ndarray, lengths: np.ndarray) -> List[str]:
+    return [_row_string(padded, lengths, i) for i in range(lengths.shape[0])]
+
+
+class _ReferenceIndex(NamedTuple):
+    """Flat (structure-of-arrays) view of the reference sequences.
+    
+    Never modified once built: writers publish a new one with a single attribute assignment,
+    so a reader holding one snapshot always sees arrays that agree with each other.
+    """
+    categories: List[str]
+    ids: List[Optional[str]]
+    cat_idx: np.ndarray
+    lens: np.ndarray
+    offsets: np.ndarray
+    packed: np.ndarray
+    valid: np.ndarray
+    sketches: np.ndarray
+    sketch_lens: np.ndarray
+
+
+_EMPTY_INDEX = _ReferenceIndex(
+    categories=[], ids=[],
+    cat_idx=np.empty(0, dtype=np.int32),
+    lens=np.empty(0, dtype=np.int64),
+    offsets=np.zeros(1, dtype=np.int64),
+    packed=np.empty(0, dtype=np.uint64),
+    valid=np.empty(0, dtype=np.uint64),
+    sketches=np.empty((0, SKETCH_SIZE), dtype=np.uint64),
+    sketch_lens=np.empty(0, dtype=np.int64)
+)
+
 
 class TaxonomyAssigner:
     """Handles taxonomic assignment for DNA sequences"""
     
     def __init__(self):
-        self.minio_client = get_minio_client()
         self.reference_db = None
         self.taxonomy_cache = {}
         
+        # Flat view of the reference sequences, see _rebuild_index; readers take one
+        # snapshot of it, and writers serialize on _index_lock and swap in a new one
+        self._index = _EMPTY_INDEX
+        self._index_lock = threading.Lock()
+        
         # NCBI API settings
         self.ncbi_base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
         self.blast_url = "https://blast.ncbi.nlm.nih.gov/Blast.cgi"
+        self.http = self._create_http_session()
+        # Caps concurrent NCBI calls across all async batches; bound to the loop it was made on
+        self._ncbi_semaphore: Optional[asyncio.Semaphore] = None
+        self._ncbi_semaphore_loop = None
         
         # Load reference taxonomy database
         self._load_reference_db()
+        
+        # Compile (or load from the numba cache) the similarity kernel before the first request
+        _similarity_kernel(*_pack("ACGT"), *_pack("ACGT"))
+    
+    def _create_http_session(self) -> requests.Session:
+        """Pooled keep-alive session for NCBI, retrying rate limits and transient errors"""
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "POST"]  # BLAST submissions are POSTs
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=NCBI_CONCURRENCY * 2, max_retries=retry)
+        
+        session = requests.Session()
+        session.mount("https://", adapter)
+        return session
     
     def _load_reference_db(self):
         """Load reference taxonomy database"""
         try:
-            # Try to load from MinIO first
-            ref_db = self.minio_client.download_json(
+            # Prefer the binary format, memory-mapped from a local copy
+            if self._load_reference_db_binary():
+                logger.info(f"Loaded binary reference database ({self._index.lens.shape[0]} sequences)")
+                return
+            
+            # Fall back to the legacy JSON database
+            ref_db = get_minio_client().download_json(
                 settings.minio_bucket_models, 
                 "taxonomy/reference_db.json"
             )
             
             if ref_db:
                 self.reference_db = ref_db
-                logger.info("Loaded reference taxonomy database from MinIO")
-            else:
-                # Initialize with basic taxonomy structure
-                self.reference_db = self._get_default_taxonomy_db()
-                logger.info("Using default taxonomy database")
+                self._rebuild_index()
+                logger.info("Loaded reference taxonomy database from MinIO (JSON), migrating to binary")
+                self._save_reference_db()
+                return
+            
+            # Initialize with basic taxonomy structure
+            self.reference_db = self._get_default_taxonomy_db()
+            logger.info("Using default taxonomy database")
                 
         except Exception as e:
             logger.error(f"Error loading reference database: {e}")
             self.reference_db = self._get_default_taxonomy_db()
+        
+        self._rebuild_index()
+    
+    def _reference_db_dir(self) -> str:
+        """Local directory holding the memory-mapped reference arrays"""
+        path = os.path.join(tempfile.gettempdir(), "taxonomy_reference_db")
+        os.makedirs(path, exist_ok=True)
+        return path
+    
+    def _load_reference_db_binary(self) -> bool:
+        """Download the binary reference database and memory-map its arrays"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        categories = get_minio_client().download_json(
+            settings.minio_bucket_models, f"{REFERENCE_DB_PREFIX}/categories.json"
+        )
+        if not categories:
+            return False
+        
+        local_dir = self._reference_db_dir()
+        # Arrays unchanged since the last load are kept on disk instead of fetched again
+        targets = {
+            f"{REFERENCE_DB_PREFIX}/{name}.npy": os.path.join(local_dir, f"{name}.npy")
+            for name in REFERENCE_DB_ARRAYS
+        }
+        downloaded = get_minio_client().download_many_to_paths(settings.minio_bucket_models, targets)
+        
+        arrays = {}
+        for name, (object_name, path) in zip(REFERENCE_DB_ARRAYS, targets.items()):
+            if not downloaded[object_name]:
+                logger.warning(f"Binary reference database is missing {name}.npy")
+                return False
+            arrays[name] = np.load(path, mmap_mode='r')
+        
+        meta_data = get_minio_client().download_file(
+            settings.minio_bucket_models, f"{REFERENCE_DB_PREFIX}/ref_meta.parquet"
+        )
+        if meta_data is None:
+            logger.warning("Binary reference database is missing ref_meta.parquet")
+            return False
+        meta = pq.read_table(pa.BufferReader(meta_data))
+        
+        self.reference_db = {entry["name"]: {"taxonomy": entry["taxonomy"]} for entry in categories}
+        self._index = _ReferenceIndex(
+            categories=[entry["name"] for entry in categories],
+            ids=meta.column("id").to_pylist(),
+            **arrays
+        )
+        return True
+    
+    def _rebuild_index(self):
+        """Flatten a dict-of-sequences reference database into packed arrays for _best_match.
+        
+        Only the category taxonomy is kept in reference_db afterwards; sequences live in the arrays.
+        """
+        categories, ref_ids, cat_idx, lens = [], [], [], []
+        packed_parts, valid_parts, sketches, sketch_lens = [], [], [], []
+        
+        for category, data in (self.reference_db or {}).items():
+            categories.append(category)
+            for ref_seq in data.get("sequences", []):
+                ref = ref_seq.get("sequence", "")
+                if not ref:
+                    continue
+                
+                packed, valid, length = _pack(ref)
+                packed_parts.append(packed)
+                valid_parts.append(valid)
+                sketch, sketch_len = _sketch(ref)
+                sketches.append(sketch)
+                sketch_lens.append(sketch_len)
+                lens.append(length)
+                ref_ids.append(ref_seq.get("id"))
+                cat_idx.append(len(categories) - 1)
+        
+        self.reference_db = {
+            category: {"taxonomy": data.get("taxonomy", self._get_unknown_taxonomy())}
+            for category, data in (self.reference_db or {}).items()
+        }
+        offsets = np.zeros(len(lens) + 1, dtype=np.int64)
+        np.cumsum([part.shape[0] for part in packed_parts], out=offsets[1:])
+        self._index = _ReferenceIndex(
+            categories=categories,
+            ids=ref_ids,
+            cat_idx=np.asarray(cat_idx, dtype=np.int32),
+            lens=np.asarray(lens, dtype=np.int64),
+            offsets=offsets,
+            packed=np.concatenate(packed_parts) if packed_parts else _EMPTY_INDEX.packed,
+            valid=np.concatenate(valid_parts) if valid_parts else _EMPTY_INDEX.valid,
+            sketches=np.vstack(sketches) if sketches else _EMPTY_INDEX.sketches,
+            sketch_lens=np.asarray(sketch_lens, dtype=np.int64)
+        )
+    
+    @staticmethod
+    def _candidate_refs(index: _ReferenceIndex, sequence: str) -> np.ndarray:
+        """Indices (in reference order) of the references worth an exact comparison"""
+        q_sketch, q_len = _sketch(sequence)
+        return _top_candidates(
+            q_sketch, q_len, index.sketches, index.sketch_lens, PREFILTER_CANDIDATES
+        )
     
     def _get_default_taxonomy_db(self) -> Dict[str, Any]:
         """Get default taxonomy database structure"""
@@ -96,29 +576,20 @@ class TaxonomyAssigner:
                 "match_details": None
             }
             
-            if not self.reference_db:
+            index = self._index
+            if not self.reference_db or not sequence or not index.lens.shape[0]:
                 return best_match
             
             # Simple sequence similarity check (placeholder)
             # In production, use proper sequence alignment algorithms
-            for category, data in self.reference_db.items():
-                ref_sequences = data.get("sequences", [])
-                
-                for ref_seq in ref_sequences:
-                    # Calculate simple similarity (replace with proper alignment)
-                    similarity = self._calculate_similarity(sequence, ref_seq.get("sequence", ""))
-                    
-                    if similarity > best_match["confidence"] and similarity >= similarity_threshold:
-                        best_match = {
-                            "taxonomy": data.get("taxonomy", self._get_unknown_taxonomy()),
-                            "confidence": similarity,
-                            "method": "local_reference",
-                            "match_details": {
-                                "reference_id": ref_seq.get("id"),
-                                "category": category,
-                                "similarity_score": similarity
-                            }
-                        }
+            # MinHash prefilter, then the exact comparison on the surviving candidates
+            best_idx, similarity = _best_match(
+                *_pack(sequence), index.packed, index.valid, index.offsets, index.lens,
+                self._candidate_refs(index, sequence)
+            )
+            
+            if best_idx >= 0 and similarity >= similarity_threshold:
+                best_match = self._local_match(index, best_idx, similarity)
             
             return best_match
             
@@ -131,6 +602,65 @@ class TaxonomyAssigner:
                 "error": str(e)
             }
     
+    def _local_match(self, index: _ReferenceIndex, ref_idx: int, similarity: float) -> Dict[str, Any]:
+        """Result record for a match against reference ref_idx of the flat index"""
+        category = index.categories[index.cat_idx[ref_idx]]
+        return {
+            "taxonomy": self.reference_db[category].get("taxonomy", self._get_unknown_taxonomy()),
+            "confidence": similarity,
+            "method": "local_reference",
+            "match_details": {
+                "reference_id": index.ids[ref_idx],
+                "category": category,
+                "similarity_score": similarity
+            }
+        }
+    
+    def _assign_local_batch(self, sequences: List[str],
+                            similarity_threshold: float = 0.8) -> List[Dict[str, Any]]:
+        """Assign taxonomy locally to many sequences in one parallel kernel call"""
+        return self._assign_local_padded(*seqs_to_padded(sequences), similarity_threshold)
+    
+    def _assign_local_padded(self, padded: np.ndarray, lengths: np.ndarray,
+                             similarity_threshold: float = 0.8) -> List[Dict[str, Any]]:
+        """Local assignment for a padded (N, L) uint8 batch, as built by seqs_to_padded"""
+        results = [{
+            "taxonomy": self._get_unknown_taxonomy(),
+            "confidence": 0.0,
+            "method": "local_reference",
+            "match_details": None
+        } for _ in range(lengths.shape[0])]
+        
+        indices = np.flatnonzero(lengths)
+        index = self._index
+        if not self.reference_db or not indices.shape[0] or not index.lens.shape[0]:
+            return results
+        
+        try:
+            q_lens = lengths[indices].astype(np.int64)
+            # Packing and sketching happen for the whole batch inside the kernel
+            packed, valid, sketches, sketch_lens = _pack_sketch_batch(
+                padded[indices], q_lens, 6, BASE_CODES
+            )
+            q_offsets = np.arange(indices.shape[0] + 1, dtype=np.int64) * packed.shape[1]
+            
+            best_idx, best_sim = _best_match_batch(
+                packed.ravel(), valid.ravel(), q_offsets, q_lens, sketches, sketch_lens,
+                index.packed, index.valid, index.offsets, index.lens,
+                index.sketches, index.sketch_lens, PREFILTER_CANDIDATES
+            )
+            
+        except Exception as e:
+            logger.error(f"Error in batched local taxonomy assignment, falling back per sequence: {e}")
+            return [self.assign_taxonomy_local(_row_string(padded, lengths, i), similarity_threshold)
+                    for i in range(lengths.shape[0])]
+        
+        for i, idx, similarity in zip(indices, best_idx, best_sim):
+            if idx >= 0 and similarity >= similarity_threshold:
+                results[i] = self._local_match(index, int(idx), float(similarity))
+        
+        return results
+    
     def assign_taxonomy_ncbi(self, sequence: str) -> Dict[str, Any]:
         """Assign taxonomy using NCBI BLAST"""
         try:
@@ -163,9 +693,10 @@ class TaxonomyAssigner:
         """Submit BLAST search to NCBI (placeholder implementation)"""
         # This is a placeholder - implement actual NCBI BLAST API calls
         # For production, you would:
-        # 1. Submit sequence to BLAST
+        # 1. Submit sequence to BLAST (self.http.post(self.blast_url, ...))
         # 2. Poll for results
         # 3. Parse XML/JSON results
+        # Use self.http for every NCBI request so connections and TLS sessions are reused
         
         logger.info("BLAST search submitted (placeholder)")
         return None
@@ -185,12 +716,9 @@ class TaxonomyAssigner:
         if not seq1 or not seq2:
             return 0.0
         
-        # Simple character-by-character comparison
+        # Simple position-by-position comparison
         # In production, use proper sequence alignment algorithms
-        min_len = min(len(seq1), len(seq2))
-        matches = sum(1 for i in range(min_len) if seq1[i] == seq2[i])
-        
-        return matches / max(len(seq1), len(seq2))
+        return _similarity_kernel(*_pack(seq1), *_pack(seq2))
     
     def _get_unknown_taxonomy(self) -> Dict[str, str]:
         """Get taxonomy structure for unknown sequences"""
@@ -204,74 +732,156 @@ class TaxonomyAssigner:
             "species": "Unknown"
         }
     
+    def _merge_hybrid(self, local_results: List[Dict[str, Any]],
+                      ncbi_results: Dict[int, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Take the NCBI result wherever it is more confident than the local one"""
+        results = list(local_results)
+        for i, ncbi_result in ncbi_results.items():
+            if ncbi_result.get("confidence", 0) > results[i].get("confidence", 0):
+                results[i] = ncbi_result
+        return results
+    
+    def _finalize_batch(self, results: List[Dict[str, Any]], method: str) -> List[Dict[str, Any]]:
+        """Tag each result with its sequence index"""
+        for i, result in enumerate(results):
+            result["sequence_index"] = i
+        
+        logger.info(f"Assigned taxonomy to {len(results)} sequences ({method})")
+        return results
+    
     def assign_taxonomy_batch(self, sequences: List[str], method: str = "local") -> List[Dict[str, Any]]:
         """Assign taxonomy to multiple sequences"""
-        results = []
-        
-        for i, sequence in enumerate(sequences):
-            try:
-                if method == "local":
-                    result = self.assign_taxonomy_local(sequence)
-                elif method == "ncbi":
-                    result = self.assign_taxonomy_ncbi(sequence)
-                else:
-                    # Try local first, fallback to NCBI if confidence is low
-                    result = self.assign_taxonomy_local(sequence)
-                    if result.get("confidence", 0) < 0.5:
-                        ncbi_result = self.assign_taxonomy_ncbi(sequence)
-                        if ncbi_result.get("confidence", 0) > result.get("confidence", 0):
-                            result = ncbi_result
-                
-                result["sequence_index"] = i
-                results.append(result)
-                
-                if (i + 1) % 10 == 0:
-                    logger.info(f"Processed {i + 1}/{len(sequences)} sequences for taxonomy")
-                    
-            except Exception as e:
-                logger.error(f"Error processing sequence {i}: {e}")
-                results.append({
-                    "sequence_index": i,
-                    "taxonomy": self._get_unknown_taxonomy(),
-                    "confidence": 0.0,
-                    "method": method,
-                    "error": str(e)
-                })
+        return self.assign_taxonomy_batch_ndarray(*seqs_to_padded(sequences), method=method)
+    
+    def assign_taxonomy_batch_ndarray(self, padded: np.ndarray, lengths: np.ndarray,
+                                      method: str = "local") -> List[Dict[str, Any]]:
+        """Assign taxonomy to a padded (N, L) uint8 batch of sequences"""
+        if method == "ncbi":
+            # NCBI lookups are network-bound; overlap them within the rate limit
+            with ThreadPoolExecutor(max_workers=NCBI_CONCURRENCY) as pool:
+                results = list(pool.map(self.assign_taxonomy_ncbi, _row_strings(padded, lengths)))
+            return self._finalize_batch(results, method)
         
-        return results
+        results = self._assign_local_padded(padded, lengths)
+        
+        if method != "local":
+            # Try local first, fallback to NCBI if confidence is low
+            low = [i for i, result in enumerate(results) if result.get("confidence", 0) < 0.5]
+            with ThreadPoolExecutor(max_workers=NCBI_CONCURRENCY) as pool:
+                ncbi_results = dict(zip(low, pool.map(
+                    self.assign_taxonomy_ncbi, [_row_string(padded, lengths, i) for i in low]
+                )))
+            results = self._merge_hybrid(results, ncbi_results)
+        
+        return self._finalize_batch(results, method)
+    
+    def _get_ncbi_semaphore(self) -> asyncio.Semaphore:
+        """The NCBI concurrency limit shared by async batches, created on the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._ncbi_semaphore is None or self._ncbi_semaphore_loop is not loop:
+            self._ncbi_semaphore = asyncio.Semaphore(NCBI_CONCURRENCY)
+            self._ncbi_semaphore_loop = loop
+        return self._ncbi_semaphore
+    
+    async def assign_taxonomy_batch_async(self, sequences: List[str],
+                                          method: str = "local") -> List[Dict[str, Any]]:
+        """Assign taxonomy to multiple sequences without blocking the event loop"""
+        return await self.assign_taxonomy_batch_ndarray_async(*seqs_to_padded(sequences), method=method)
+    
+    async def assign_taxonomy_batch_ndarray_async(self, padded: np.ndarray, lengths: np.ndarray,
+                                                  method: str = "local") -> List[Dict[str, Any]]:
+        """Async counterpart of assign_taxonomy_batch_ndarray"""
+        semaphore = self._get_ncbi_semaphore()
+        
+        async def ncbi(i: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await asyncio.to_thread(self.assign_taxonomy_ncbi, _row_string(padded, lengths, i))
+        
+        if method == "ncbi":
+            results = await asyncio.gather(*(ncbi(i) for i in range(lengths.shape[0])))
+            return self._finalize_batch(list(results), method)
+        
+        results = await asyncio.to_thread(self._assign_local_padded, padded, lengths)
+        
+        if method != "local":
+            low = [i for i, result in enumerate(results) if result.get("confidence", 0) < 0.5]
+            ncbi_results = await asyncio.gather(*(ncbi(i) for i in low))
+            results = self._merge_hybrid(results, dict(zip(low, ncbi_results)))
+        
+        return self._finalize_batch(results, method)
     
     def add_reference_sequence(self, sequence: str, taxonomy: Dict[str, str], 
                              category: str = "custom", sequence_id: str = None) -> bool:
         """Add a sequence to the reference database"""
         try:
-            if category not in self.reference_db:
-                self.reference_db[category] = {
-                    "sequences": [],
-                    "taxonomy": taxonomy
-                }
-            
-            sequence_entry = {
-                "id": sequence_id or f"seq_{len(self.reference_db[category]['sequences'])}",
-                "sequence": sequence,
-                "taxonomy": taxonomy
-            }
-            
-            self.reference_db[category]["sequences"].append(sequence_entry)
-            
-            # Save updated database
-            return self._save_reference_db()
+            with self._index_lock:
+                index = self._index
+                categories = index.categories
+                if category not in self.reference_db:
+                    self.reference_db[category] = {"taxonomy": taxonomy}
+                if category not in categories:
+                    categories = categories + [category]
+                cat_idx = categories.index(category)
+                
+                if sequence:
+                    # Extend the flat index instead of rebuilding it; the new arrays are built
+                    # aside and published together, never written into the live snapshot
+                    packed, valid, length = _pack(sequence)
+                    sketch, sketch_len = _sketch(sequence)
+                    ref_id = sequence_id or f"seq_{int(np.count_nonzero(index.cat_idx == cat_idx))}"
+                    
+                    index = _ReferenceIndex(
+                        categories=categories,
+                        ids=index.ids + [ref_id],
+                        cat_idx=np.append(index.cat_idx, np.int32(cat_idx)),
+                        lens=np.append(index.lens, np.int64(length)),
+                        offsets=np.append(index.offsets, index.offsets[-1] + packed.shape[0]),
+                        packed=np.concatenate([index.packed, packed]),
+                        valid=np.concatenate([index.valid, valid]),
+                        sketches=np.vstack([index.sketches, sketch[None, :]]),
+                        sketch_lens=np.append(index.sketch_lens, np.int64(sketch_len))
+                    )
+                else:
+                    index = index._replace(categories=categories)
+                self._index = index
+                
+                # Save updated database
+                return self._save_reference_db(index)
             
         except Exception as e:
             logger.error(f"Error adding reference sequence: {e}")
             return False
     
-    def _save_reference_db(self) -> bool:
-        """Save reference database to MinIO"""
+    def _save_reference_db(self, index: Optional[_ReferenceIndex] = None) -> bool:
+        """Save reference database to MinIO in the binary format"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        if index is None:
+            index = self._index
         try:
-            return self.minio_client.upload_json(
+            for name in REFERENCE_DB_ARRAYS:
+                array = getattr(index, name)
+                buffer = io.BytesIO()
+                np.save(buffer, np.ascontiguousarray(array))
+                if not get_minio_client().upload_file(
+                    settings.minio_bucket_models, f"{REFERENCE_DB_PREFIX}/{name}.npy", buffer
+                ):
+                    return False
+            
+            buffer = io.BytesIO()
+            pq.write_table(pa.table({"id": pa.array(index.ids, type=pa.string())}), buffer)
+            if not get_minio_client().upload_file(
+                settings.minio_bucket_models, f"{REFERENCE_DB_PREFIX}/ref_meta.parquet", buffer
+            ):
+                return False
+            
+            # categories.json is written last; its presence marks a complete binary database
+            return get_minio_client().upload_json(
                 settings.minio_bucket_models,
-                "taxonomy/reference_db.json",
-                self.reference_db
+                f"{REFERENCE_DB_PREFIX}/categories.json",
+                [{"name": name, "taxonomy": self.reference_db[name].get("taxonomy")}
+                 for name in index.categories]
             )
         except Exception as e:
             logger.error(f"Error saving reference database: {e}")
@@ -282,22 +892,14 @@ class TaxonomyAssigner:
         if not self.reference_db:
             return {"total_categories": 0, "total_sequences": 0}
         
-        total_sequences = sum(
-            len(data.get("sequences", [])) 
-            for data in self.reference_db.values()
-        )
-        
         return {
             "total_categories": len(self.reference_db),
-            "total_sequences": total_sequences,
+            "total_sequences": int(self._index.lens.shape[0]),
             "categories": list(self.reference_db.keys())
         }
 
 
-# Global instance
-taxonomy_assigner = TaxonomyAssigner()
-
-
+@lru_cache(maxsize=None)
 def get_taxonomy_assigner() -> TaxonomyAssigner:
-    """Get the global taxonomy assigner instance"""
-    return taxonomy_assigner
\ No newline at end of file
+    """Get the global taxonomy assigner instance, loading the reference database on first use"""
+    return TaxonomyAssigner()
@@ -1,30 +1,102 @@
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
+from typing import List, Optional, Tuple
+import asyncio
 import io
 import logging
+import multiprocessing
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import numpy as np
 
 from app.core.config import get_settings
-from app.core.database import get_db, engine, Base, Sequence, Cluster, Job, Metrics
+from app.core.database import get_db, get_async_db, async_engine, create_tables, Sequence, Cluster, Job, Metrics, row_to_dict
 from app.api.models import (
     SequenceCreate, SequenceResponse, ClusterRequest, ClusterResponse, 
     MetricsResponse, SimilarityRequest, TaxonomyRequest
 )
-from app.services.ml_pipeline import get_dna_preprocessor, get_dna_embedder
-from app.services.clustering import get_sequence_clusterer, get_similarity_searcher
-from app.services.taxonomy import get_taxonomy_assigner
-from app.core.utils import get_minio_client
+from app.services.ml_pipeline import DNAPreprocessor, get_dna_preprocessor, get_dna_embedder
+from app.services.clustering import (
+    SimilarityBatcher, get_sequence_clusterer, get_similarity_batcher, get_similarity_searcher
+)
+from app.services.taxonomy import TaxonomyAssigner, get_taxonomy_assigner
+from app.core.fasta import parse_fasta_stream
+from app.core.kmer import seqs_to_padded
+from app.core.cache import get_embed_cache
+from app.core.utils import dequantize_embeddings, quantize_embedding
+
+# Create database tables, adding any columns introduced since they were created
+create_tables()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up per-process services on startup and release them on shutdown"""
+    # Load the models and reference data before the first request instead of during it.
+    # The embedder is only used by background jobs, which load it in the worker processes.
+    get_dna_preprocessor()
+    get_taxonomy_assigner()
+    _build_similarity_index()
+    
+    # Worker processes for CPU-heavy background jobs; spawn rather than fork, since a
+    # forked child can't use CUDA state the parent already set up
+    app.state.process_pool = ProcessPoolExecutor(
+        max_workers=settings.background_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_warm_worker
+    )
+    
+    yield
+    
+    app.state.process_pool.shutdown(wait=False, cancel_futures=True)
+    await async_engine.dispose()
+
+
+# Stored embeddings: float32 bytes, or int8 bytes plus a scale when quantized storage is on
+EMBEDDING_COLUMNS = (Sequence.id, Sequence.embedding, Sequence.embedding_i8, Sequence.embedding_scale)
+HAS_EMBEDDING = or_(Sequence.embedding.isnot(None), Sequence.embedding_i8.isnot(None))
+
+
+def _embedding_matrix(rows: list) -> np.ndarray:
+    """One float32 (N, d) matrix from rows of EMBEDDING_COLUMNS"""
+    if all(row.embedding is not None for row in rows):
+        return np.frombuffer(b"".join(row.embedding for row in rows), dtype=np.float32).reshape(len(rows), -1)
+    if all(row.embedding is None for row in rows):
+        return dequantize_embeddings([row.embedding_i8 for row in rows], [row.embedding_scale for row in rows])
+    
+    # Rows written before and after switching storage modes
+    return np.vstack([
+        np.frombuffer(row.embedding, dtype=np.float32) if row.embedding is not None
+        else dequantize_embeddings([row.embedding_i8], [row.embedding_scale])[0]
+        for row in rows
+    ])
+
+
+def _build_similarity_index():
+    """Index every stored embedding, so similarity search covers earlier uploads"""
+    db = next(get_db())
+    try:
+        rows = db.query(*EMBEDDING_COLUMNS).filter(HAS_EMBEDDING).all()
+    finally:
+        db.close()
+    
+    if rows:
+        get_similarity_searcher().build_index(_embedding_matrix(rows), [row.id for row in rows])
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="DeepSea eDNA API",
     description="API for eDNA sequence analysis and species classification",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -36,6 +108,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (sequence and cluster listings)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -43,14 +118,6 @@ logger = logging.getLogger(__name__)
 # Get settings
 settings = get_settings()
 
-# Get service instances
-dna_preprocessor = get_dna_preprocessor()
-dna_embedder = get_dna_embedder()
-sequence_clusterer = get_sequence_clusterer()
-similarity_searcher = get_similarity_searcher()
-taxonomy_assigner = get_taxonomy_assigner()
-minio_client = get_minio_client()
-
 
 @app.get("/")
 async def root():
@@ -64,14 +131,18 @@ async def health_check():
 
 # Sequence endpoints
 @app.get("/api/sequences", response_model=List[SequenceResponse])
-async def get_sequences(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_sequences(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """Get all sequences with pagination"""
-    sequences = db.query(Sequence).offset(skip).limit(limit).all()
-    return sequences
+    result = await db.execute(select(Sequence).options(defer(Sequence.embedding), defer(Sequence.embedding_i8)).offset(skip).limit(limit))
+    sequences = result.scalars().all()
+    # Rows come from our own database; skip re-validating them through the response model
+    return ORJSONResponse([row_to_dict(seq) for seq in sequences])
 
 
 @app.post("/api/sequences", response_model=SequenceResponse)
-async def create_sequence(sequence: SequenceCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def create_sequence(sequence: SequenceCreate, background_tasks: BackgroundTasks,
+                          db: AsyncSession = Depends(get_async_db),
+                          dna_preprocessor: DNAPreprocessor = Depends(get_dna_preprocessor)):
     """Create a new sequence and trigger analysis"""
     try:
         # Validate and preprocess sequence
@@ -82,8 +153,9 @@ async def create_sequence(sequence: SequenceCreate, background_tasks: Background
         # Clean sequence
         cleaned_sequence = dna_preprocessor.clean_sequence(sequence.sequence_data)
         
-        # Get sequence statistics
-        stats = dna_preprocessor.get_sequence_stats(cleaned_sequence)
+        # Get sequence statistics; cleaning doesn't change the ACGT counts, so the raw
+        # sequence hits the counts cached by validate_sequence instead of recounting
+        stats = dna_preprocessor.get_sequence_stats(sequence.sequence_data)
         
         # Create sequence record
         db_sequence = Sequence(
@@ -96,8 +168,8 @@ async def create_sequence(sequence: SequenceCreate, background_tasks: Background
         )
         
         db.add(db_sequence)
-        db.commit()
-        db.refresh(db_sequence)
+        await db.commit()
+        await db.refresh(db_sequence)
         
         # Schedule background processing
         background_tasks.add_task(process_sequence_background, db_sequence.id)
@@ -110,55 +182,79 @@ async def create_sequence(sequence: SequenceCreate, background_tasks: Background
 
 
 @app.get("/api/sequences/{sequence_id}", response_model=SequenceResponse)
-async def get_sequence(sequence_id: int, db: Session = Depends(get_db)):
+async def get_sequence(sequence_id: int, db: AsyncSession = Depends(get_async_db)):
     """Get a specific sequence by ID"""
-    sequence = db.query(Sequence).filter(Sequence.id == sequence_id).first()
+    result = await db.execute(
+        select(Sequence).options(defer(Sequence.embedding), defer(Sequence.embedding_i8)).where(Sequence.id == sequence_id)
+    )
+    sequence = result.scalars().first()
     if not sequence:
         raise HTTPException(status_code=404, detail="Sequence not found")
-    return sequence
+    return ORJSONResponse(row_to_dict(sequence))
+
+
+async def _insert_upload_batch(records: List[tuple], db: AsyncSession, dna_preprocessor: DNAPreprocessor) -> list:
+    """Validate a batch of parsed FASTA records and insert the valid ones, returning (id, name) rows"""
+    # Validate, clean and GC-count the whole batch at once
+    processed = dna_preprocessor.preprocess_batch([seq_data for _, seq_data in records])
+    
+    rows = []
+    for (name, _), (is_valid, message, cleaned_sequence, gc_content) in zip(records, processed):
+        if not is_valid:
+            logger.warning(f"Skipping invalid sequence {name}: {message}")
+            continue
+        
+        rows.append({
+            "name": name,
+            "sequence_data": cleaned_sequence,
+            "length": len(cleaned_sequence),
+            "gc_content": gc_content,
+            "quality_score": 0.9 if cleaned_sequence else 0.1,
+            "status": "processing"
+        })
+    
+    if not rows:
+        return []
+    
+    # One multi-row INSERT without ORM instance tracking; ids come back in row order
+    result = await db.execute(
+        insert(Sequence).returning(Sequence.id, Sequence.name, sort_by_parameter_order=True),
+        rows
+    )
+    created = result.all()
+    await db.commit()
+    
+    return created
 
 
 @app.post("/api/sequences/upload")
-async def upload_sequences(file: UploadFile = File(...), background_tasks: BackgroundTasks = None, db: Session = Depends(get_db)):
+async def upload_sequences(file: UploadFile = File(...), background_tasks: BackgroundTasks = None,
+                           db: AsyncSession = Depends(get_async_db),
+                           dna_preprocessor: DNAPreprocessor = Depends(get_dna_preprocessor)):
     """Upload sequences from FASTA file"""
     try:
         if not file.filename.endswith(('.fasta', '.fa', '.fas')):
             raise HTTPException(status_code=400, detail="Only FASTA files are supported")
         
-        # Read file content
-        content = await file.read()
-        sequences = parse_fasta_content(content.decode('utf-8'))
-        
+        # Stream the file and ingest records in batches as they complete
         created_sequences = []
-        for name, seq_data in sequences:
-            # Validate sequence
-            is_valid, message = dna_preprocessor.validate_sequence(seq_data)
-            if not is_valid:
-                logger.warning(f"Skipping invalid sequence {name}: {message}")
+        batch = []
+        async for record in parse_fasta_stream(file, settings.upload_chunk_size):
+            batch.append(record)
+            if len(batch) < settings.upload_batch_size:
                 continue
             
-            # Clean and create sequence
-            cleaned_sequence = dna_preprocessor.clean_sequence(seq_data)
-            stats = dna_preprocessor.get_sequence_stats(cleaned_sequence)
-            
-            db_sequence = Sequence(
-                name=name,
-                sequence_data=cleaned_sequence,
-                length=stats["length"],
-                gc_content=stats["gc_content"],
-                quality_score=0.9 if stats["valid"] else 0.1,
-                status="processing"
-            )
-            
-            db.add(db_sequence)
-            created_sequences.append(db_sequence)
-        
-        db.commit()
-        
-        # Schedule background processing for all sequences
-        if background_tasks:
-            for seq in created_sequences:
-                background_tasks.add_task(process_sequence_background, seq.id)
+            created = await _insert_upload_batch(batch, db, dna_preprocessor)
+            if background_tasks and created:
+                background_tasks.add_task(process_sequences_background, [seq.id for seq in created])
+            created_sequences.extend(created)
+            batch = []
+        
+        if batch:
+            created = await _insert_upload_batch(batch, db, dna_preprocessor)
+            if background_tasks and created:
+                background_tasks.add_task(process_sequences_background, [seq.id for seq in created])
+            created_sequences.extend(created)
         
         return {
             "message": f"Uploaded {len(created_sequences)} sequences",
@@ -175,7 +271,7 @@ async def upload_sequences(file: UploadFile = File(...), background_tasks: Backg
 async def get_clusters(db: Session = Depends(get_db)):
     """Get all clusters"""
     clusters = db.query(Cluster).all()
-    return clusters
+    return ORJSONResponse([row_to_dict(cluster) for cluster in clusters])
 
 
 @app.post("/api/clusters/create")
@@ -191,7 +287,9 @@ async def create_clusters(request: ClusterRequest, background_tasks: BackgroundT
         job = Job(
             job_type="clustering",
             status="running",
-            parameters={"min_cluster_size": request.min_cluster_size, "min_samples": request.min_samples}
+            input_data=orjson.dumps(
+                {"min_cluster_size": request.min_cluster_size, "min_samples": request.min_samples}
+            ).decode()
         )
         db.add(job)
         db.commit()
@@ -212,24 +310,25 @@ async def create_clusters(request: ClusterRequest, background_tasks: BackgroundT
 async def get_metrics(db: Session = Depends(get_db)):
     """Get analysis metrics"""
     metrics = db.query(Metrics).all()
-    return metrics
+    return ORJSONResponse([row_to_dict(metric) for metric in metrics])
 
 
 @app.post("/api/analysis/similarity")
-async def find_similar_sequences(request: SimilarityRequest, db: Session = Depends(get_db)):
+async def find_similar_sequences(request: SimilarityRequest, db: Session = Depends(get_db),
+                                 similarity_batcher: SimilarityBatcher = Depends(get_similarity_batcher)):
     """Find similar sequences to a query sequence"""
     try:
         # Get query sequence
-        query_sequence = db.query(Sequence).filter(Sequence.id == request.sequence_id).first()
+        query_sequence = db.query(*EMBEDDING_COLUMNS).filter(Sequence.id == request.sequence_id).first()
         if not query_sequence:
             raise HTTPException(status_code=404, detail="Query sequence not found")
         
-        if not query_sequence.embedding:
+        if not query_sequence.embedding and not query_sequence.embedding_i8:
             raise HTTPException(status_code=400, detail="Query sequence has no embedding")
         
-        # Perform similarity search
-        results = similarity_searcher.search_similar(
-            query_sequence.embedding, 
+        # Perform similarity search, batched with concurrent requests
+        results = await similarity_batcher.search(
+            _embedding_matrix([query_sequence])[0], 
             k=request.limit or 10
         )
         
@@ -241,25 +340,33 @@ async def find_similar_sequences(request: SimilarityRequest, db: Session = Depen
 
 
 @app.post("/api/analysis/taxonomy")
-async def assign_taxonomy(request: TaxonomyRequest, db: Session = Depends(get_db)):
+async def assign_taxonomy(request: TaxonomyRequest, db: Session = Depends(get_db),
+                          taxonomy_assigner: TaxonomyAssigner = Depends(get_taxonomy_assigner)):
     """Assign taxonomy to sequences"""
     try:
-        sequences = db.query(Sequence).filter(Sequence.id.in_(request.sequence_ids)).all()
+        # Plain rows, not ORM instances: results are written back with one bulk UPDATE
+        sequences = db.query(Sequence.id, Sequence.sequence_data).filter(
+            Sequence.id.in_(request.sequence_ids)
+        ).all()
         if not sequences:
             raise HTTPException(status_code=404, detail="No sequences found")
         
-        # Assign taxonomy
-        sequence_data = [seq.sequence_data for seq in sequences]
-        taxonomy_results = taxonomy_assigner.assign_taxonomy_batch(
-            sequence_data, 
+        # Encode the batch once into a padded byte matrix, then assign taxonomy
+        padded, lengths = seqs_to_padded([seq.sequence_data for seq in sequences])
+        taxonomy_results = await taxonomy_assigner.assign_taxonomy_batch_ndarray_async(
+            padded, lengths,
             method=request.method or "local"
         )
         
-        # Update sequences with taxonomy
-        for seq, result in zip(sequences, taxonomy_results):
-            seq.taxonomy = result.get("taxonomy", {})
-            seq.taxonomy_confidence = result.get("confidence", 0.0)
-        
+        # Update sequences with taxonomy in one executemany UPDATE by primary key
+        db.execute(update(Sequence), [
+            {
+                "id": seq.id,
+                "taxonomy": result.get("taxonomy", {}),
+                "taxonomy_confidence": result.get("confidence", 0.0)
+            }
+            for seq, result in zip(sequences, taxonomy_results)
+        ])
         db.commit()
         
         return {"results": taxonomy_results}
@@ -280,49 +387,109 @@ async def get_job_status(job_id: int, db: Session = Depends(get_db)):
 
 
 # Background processing functions
+def _warm_worker():
+    """Load the models in each worker process before its first job"""
+    get_dna_embedder()
+    get_taxonomy_assigner()
+
+
+async def _run_in_worker(func, *args):
+    """Run func in the process pool so model and clustering work never holds the API's GIL"""
+    return await asyncio.get_running_loop().run_in_executor(app.state.process_pool, func, *args)
+
+
 async def process_sequence_background(sequence_id: int):
     """Background task for processing a single sequence"""
+    await process_sequences_background([sequence_id])
+
+
+async def process_sequences_background(sequence_ids: List[int]):
+    """Background task for embedding and classifying many sequences in batches"""
+    embedded_ids, embedded = await _run_in_worker(_process_sequences, sequence_ids)
+    
+    # Keep the similarity index in step with the embeddings just stored
+    if embedded_ids:
+        get_similarity_searcher().add_embeddings(np.vstack(embedded), embedded_ids)
+
+
+def _process_sequences(sequence_ids: List[int]) -> Tuple[List[str], List[np.ndarray]]:
+    """Embed and classify sequences; runs in a worker process.
+    
+    Returns the ids and embeddings that were committed, for the API process's search index.
+    """
+    embedded_ids, embedded = [], []
     try:
         db = next(get_db())
-        sequence = db.query(Sequence).filter(Sequence.id == sequence_id).first()
+        sequences = db.query(Sequence.id, Sequence.sequence_data).filter(Sequence.id.in_(sequence_ids)).all()
         
-        if not sequence:
-            logger.error(f"Sequence {sequence_id} not found")
-            return
-        
-        logger.info(f"Processing sequence {sequence_id}: {sequence.name}")
-        
-        # Generate embedding
-        embedding = dna_embedder.generate_embedding(sequence.sequence_data)
-        if embedding is not None:
-            sequence.embedding = embedding.tolist()
+        if not sequences:
+            logger.error(f"Sequences {sequence_ids} not found")
+            return embedded_ids, embedded
         
-        # Assign taxonomy
-        taxonomy_result = taxonomy_assigner.assign_taxonomy_local(sequence.sequence_data)
-        sequence.taxonomy = taxonomy_result.get("taxonomy", {})
-        sequence.taxonomy_confidence = taxonomy_result.get("confidence", 0.0)
+        logger.info(f"Processing {len(sequences)} sequences")
+        dna_embedder = get_dna_embedder()
+        taxonomy_assigner = get_taxonomy_assigner()
+        embed_cache = get_embed_cache()
         
-        # Update status
-        sequence.status = "completed"
+        for start in range(0, len(sequences), settings.background_batch_size):
+            batch = sequences[start:start + settings.background_batch_size]
+            sequence_data = [seq.sequence_data for seq in batch]
+            
+            # Generate embeddings; repeated sequences are served from the content-addressed cache
+            embeddings = embed_cache.get_or_compute_many(
+                sequence_data, dna_embedder.cache_id, dna_embedder.generate_batch_embeddings
+            )
+            
+            # Assign taxonomy
+            taxonomy_results = taxonomy_assigner.assign_taxonomy_batch(sequence_data, method="local")
+            
+            # One executemany UPDATE by primary key for the whole batch
+            rows = []
+            for seq, embedding, taxonomy_result in zip(batch, embeddings, taxonomy_results):
+                row = {
+                    "id": seq.id,
+                    "taxonomy": taxonomy_result.get("taxonomy", {}),
+                    "taxonomy_confidence": taxonomy_result.get("confidence", 0.0),
+                    "status": "completed"
+                }
+                if embedding is not None and settings.embedding_storage_int8:
+                    row["embedding_i8"], row["embedding_scale"] = quantize_embedding(embedding)
+                elif embedding is not None:
+                    row["embedding"] = np.asarray(embedding, dtype=np.float32).tobytes()
+                rows.append(row)
+            
+            db.execute(update(Sequence), rows)
+            db.commit()
+            
+            for seq, embedding in zip(batch, embeddings):
+                if embedding is not None:
+                    embedded_ids.append(seq.id)
+                    embedded.append(embedding)
         
-        db.commit()
-        logger.info(f"Completed processing sequence {sequence_id}")
+        logger.info(f"Completed processing {len(sequences)} sequences")
         
     except Exception as e:
-        logger.error(f"Error processing sequence {sequence_id}: {e}")
+        logger.error(f"Error processing sequences {sequence_ids}: {e}")
         # Update sequence status to failed
         try:
             db = next(get_db())
-            sequence = db.query(Sequence).filter(Sequence.id == sequence_id).first()
-            if sequence:
-                sequence.status = "failed"
-                db.commit()
+            db.query(Sequence).filter(
+                Sequence.id.in_(sequence_ids), Sequence.status != "completed"
+            ).update({"status": "failed"}, synchronize_session=False)
+            db.commit()
         except:
             pass
+    
+    return embedded_ids, embedded
 
 
 async def run_clustering_background(job_id: int, sequence_ids: List[int], request: ClusterRequest):
     """Background task for clustering sequences"""
+    await _run_in_worker(_run_clustering, job_id, sequence_ids, request)
+
+
+def _run_clustering(job_id: int, sequence_ids: List[int], request: ClusterRequest):
+    """Cluster sequences and record the result on the job; runs in a worker process"""
     try:
         db = next(get_db())
         job = db.query(Job).filter(Job.id == job_id).first()
@@ -334,9 +501,9 @@ async def run_clustering_background(job_id: int, sequence_ids: List[int], reques
         logger.info(f"Running clustering job {job_id}")
         
         # Get sequences with embeddings
-        sequences = db.query(Sequence).filter(
+        sequences = db.query(*EMBEDDING_COLUMNS).filter(
             Sequence.id.in_(sequence_ids),
-            Sequence.embedding.isnot(None)
+            HAS_EMBEDDING
         ).all()
         
         if not sequences:
@@ -345,42 +512,46 @@ async def run_clustering_background(job_id: int, sequence_ids: List[int], reques
             db.commit()
             return
         
-        # Extract embeddings
-        embeddings = [seq.embedding for seq in sequences]
+        # One contiguous (N, D) float32 matrix straight from the stored bytes
+        embeddings = _embedding_matrix(sequences)
         
         # Perform clustering
-        clustering_result = sequence_clusterer.cluster_sequences(
+        clustering_result = get_sequence_clusterer().cluster_sequences(
             embeddings,
             min_cluster_size=request.min_cluster_size,
             min_samples=request.min_samples
         )
         
+        # Cluster sizes in one counting pass over the non-noise labels
+        labels = np.asarray(clustering_result["cluster_labels"], dtype=np.int64)
+        assigned = np.flatnonzero(labels != -1)
+        sizes = np.bincount(labels[assigned])
+        
         # Create cluster records
         cluster_map = {}
         for cluster_id, center in clustering_result["cluster_centers"].items():
             cluster = Cluster(
                 name=f"Cluster {cluster_id}",
-                center_embedding=center,
-                size=0  # Will be updated below
+                center_embedding=np.asarray(center, dtype=np.float32).tobytes(),
+                sequence_count=int(sizes[cluster_id])
             )
             db.add(cluster)
-            db.flush()
             cluster_map[cluster_id] = cluster
+        db.flush()
         
-        # Update sequence cluster assignments
-        for assignment in clustering_result["cluster_assignments"]:
-            seq_idx = assignment["sequence_index"]
-            cluster_id = assignment["cluster_id"]
-            
-            if seq_idx < len(sequences):
-                sequence = sequences[seq_idx]
-                if cluster_id is not None and cluster_id in cluster_map:
-                    sequence.cluster_id = cluster_map[cluster_id].id
-                    cluster_map[cluster_id].size += 1
+        # Update sequence cluster assignments with one executemany UPDATE by primary key
+        assignments = [
+            {"id": sequences[i].id, "cluster_id": cluster_map[int(labels[i])].id}
+            for i in assigned if int(labels[i]) in cluster_map
+        ]
+        if assignments:
+            db.execute(update(Sequence), assignments)
         
         # Update job status
         job.status = "completed"
-        job.result = clustering_result
+        job.result_data = orjson.dumps(
+            clustering_result, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode()
         
         db.commit()
         logger.info(f"Completed clustering job {job_id}")
@@ -398,29 +569,6 @@ async def run_clustering_background(job_id: int, sequence_ids: List[int], reques
             pass
 
 
-def parse_fasta_content(content: str) -> List[tuple]:
-    """Parse FASTA file content"""
-    sequences = []
-    current_name = None
-    current_seq = []
-    
-    for line in content.strip().split('\n'):
-        line = line.strip()
-        if line.startswith('>'):
-            if current_name and current_seq:
-                sequences.append((current_name, ''.join(current_seq)))
-            current_name = line[1:].split()[0]  # Take first part of header
-            current_seq = []
-        elif line and current_name:
-            current_seq.append(line)
-    
-    # Add last sequence
-    if current_name and current_seq:
-        sequences.append((current_name, ''.join(current_seq)))
-    
-    return sequences
-
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,291 @@
+import asyncio
+import time
+from typing import List
+
+import numpy as np
+import pytest
+
+from app.core.cache import EmbedCache
+from app.core.fasta import _parse_fasta_python, parse_fasta
+from app.core.kmer import kmer_hashes, kmer_string
+from app.services import clustering
+from app.services.clustering import SequenceClusterer, SimilarityBatcher, SimilaritySearcher
+from app.services.taxonomy import _pack, _similarity_kernel
+
+
+def _random_sequences(rng: np.random.Generator, n: int, alphabet: str = "ACGT",
+                      max_length: int = 300) -> List[str]:
+    letters = np.array(list(alphabet))
+    return ["".join(rng.choice(letters, int(length))) for length in rng.integers(1, max_length, n)]
+
+
+# K-mer hashing: rolling 2-bit hashes must match hashing every slice directly
+def _kmer_hashes_by_slicing(sequence: str, k: int) -> List[int]:
+    codes = {"A": 0, "C": 1, "G": 2, "T": 3}
+    hashes = []
+    for i in range(len(sequence) - k + 1):
+        kmer = sequence[i:i + k].upper()
+        if all(base in codes for base in kmer):
+            hashes.append(sum(codes[base] << (2 * (k - 1 - j)) for j, base in enumerate(kmer)))
+    return hashes
+
+
+@pytest.mark.parametrize("k", [1, 4, 6, 16])
+def test_kmer_hashes_match_slicing(k):
+    rng = np.random.default_rng(k)
+    sequences = _random_sequences(rng, 50, alphabet="ACGTacgtN") + ["", "ACG", "NNNNNNNN"]
+
+    for sequence in sequences:
+        assert kmer_hashes(sequence, k).tolist() == _kmer_hashes_by_slicing(sequence, k)
+
+
+def test_kmer_hashes_reject_bad_k():
+    with pytest.raises(ValueError):
+        kmer_hashes("ACGT", 17)
+
+
+def test_kmer_string_matches_slicing():
+    sequence = "ACGTTGCAAGGCTTAACG"
+    assert kmer_string(sequence, 6) == " ".join(sequence[i:i + 6] for i in range(len(sequence) - 5))
+    assert kmer_string(sequence, 6, max_kmers=3) == "ACGTTG CGTTGC GTTGCA"
+    assert kmer_string("ACG", 6) == ""
+
+
+# Batched clustering
+def _blobs(n_samples: int = 4000, n_blobs: int = 6, dimension: int = 8, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=20, size=(n_blobs, dimension))
+    truth = rng.integers(0, n_blobs, n_samples)
+    points = (centers[truth] + rng.normal(size=(n_samples, dimension))).astype(np.float32)
+    return points, truth
+
+
+def _assert_labels_match_blobs(labels: np.ndarray, truth: np.ndarray):
+    """Each blob gets one label and each label covers one blob (noise aside)"""
+    clustered = labels != -1
+    assert clustered.mean() > 0.9
+    for blob in np.unique(truth):
+        assert len(np.unique(labels[clustered & (truth == blob)])) == 1
+    for label in np.unique(labels[clustered]):
+        assert len(np.unique(truth[labels == label])) == 1
+
+
+def test_cluster_batched_labels_consistent_across_batches():
+    points, truth = _blobs()
+    clusterer = SequenceClusterer()
+
+    labels, probabilities = clusterer._cluster_batched(points, 5, 3, batch_size=500, n_epochs=3, n_seeds=5)
+
+    _assert_labels_match_blobs(labels, truth)
+    assert labels.max() == len(np.unique(truth)) - 1  # compact 0..n-1 labels
+    assert probabilities.shape == labels.shape
+    assert clusterer.clusterer is None
+
+
+def test_cluster_batched_without_seeds_relies_on_merge():
+    points, truth = _blobs()
+    labels, _ = SequenceClusterer()._cluster_batched(points, 5, 3, batch_size=500, n_epochs=3, n_seeds=0)
+    _assert_labels_match_blobs(labels, truth)
+
+
+def test_merge_overlapping_clusters():
+    points, truth = _blobs(n_samples=600, n_blobs=3)
+    # Split blob 0 in two and mark a few points as noise
+    labels = truth.copy()
+    labels[(truth == 0) & (np.arange(len(truth)) % 2 == 0)] = 7
+    labels[:5] = -1
+
+    merged = SequenceClusterer._merge_overlapping_clusters(points, labels)
+
+    assert (merged[:5] == -1).all()
+    assert sorted(np.unique(merged[5:])) == [0, 1, 2]
+    _assert_labels_match_blobs(merged, truth)
+
+
+def test_cluster_sequences_batched_path(monkeypatch):
+    points, truth = _blobs(n_samples=3000)
+    monkeypatch.setattr(clustering.settings, "clustering_batch_threshold", 1000)
+    monkeypatch.setattr(clustering.settings, "clustering_batch_size", 500)
+    clusterer = SequenceClusterer()
+
+    result = clusterer.cluster_sequences(points, min_cluster_size=5, min_samples=3)
+
+    labels = np.asarray(result["cluster_labels"])
+    _assert_labels_match_blobs(labels, truth)
+    assert result["n_clusters"] == len(result["cluster_centers"]) == len(np.unique(truth))
+    assert all(len(center) == points.shape[1] for center in result["cluster_centers"].values())
+
+    # No single fitted model describes merged batch labels, so it can't be saved
+    assert clusterer.batched_fit
+    assert not clusterer.save_cluster_model("batched")
+
+
+# Similarity search
+def _flat_searcher(monkeypatch, n_vectors: int = 200, dimension: int = 16):
+    monkeypatch.setattr(clustering.settings, "faiss_index_type", "flat")
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(n_vectors, dimension)).astype(np.float32)
+    searcher = SimilaritySearcher()
+    assert searcher.build_index(list(embeddings), [f"seq{i}" for i in range(n_vectors)])
+    return searcher, embeddings
+
+
+def test_search_similar_batch_matches_single_queries(monkeypatch):
+    searcher, embeddings = _flat_searcher(monkeypatch)
+    queries = embeddings[:20].copy()
+
+    batch_results = searcher.search_similar_batch(queries, k=5)
+
+    # Queries are normalized on a copy, not in place
+    assert np.array_equal(queries, embeddings[:20])
+    assert batch_results == [searcher.search_similar(query, k=5) for query in queries]
+    assert [results[0]["sequence_id"] for results in batch_results] == [f"seq{i}" for i in range(20)]
+
+
+def test_similarity_batcher_coalesces_concurrent_queries(monkeypatch):
+    searcher, embeddings = _flat_searcher(monkeypatch)
+    calls = []
+    search_batch = searcher.search_similar_batch
+
+    def recording_search(queries, k):
+        calls.append((len(queries), k))
+        return search_batch(queries, k)
+
+    monkeypatch.setattr(searcher, "search_similar_batch", recording_search)
+    batcher = SimilarityBatcher(searcher, window_seconds=0.01)
+
+    async def run():
+        return await asyncio.gather(*(batcher.search(embeddings[i], k=1 + i % 3) for i in range(8)))
+
+    results = asyncio.run(run())
+
+    assert calls == [(8, 3)]
+    assert [len(r) for r in results] == [1 + i % 3 for i in range(8)]
+    assert results == [search_batch(embeddings[i:i + 1], 1 + i % 3)[0] for i in range(8)]
+
+
+# Sequence similarity: the 2-bit packed kernel must match the position-by-position loop
+def _similarity_by_loop(seq1: str, seq2: str) -> float:
+    min_len = min(len(seq1), len(seq2))
+    matches = sum(1 for i in range(min_len) if seq1[i] == seq2[i])
+    return matches / max(len(seq1), len(seq2))
+
+
+def test_similarity_kernel_matches_loop():
+    rng = np.random.default_rng(1)
+    sequences = _random_sequences(rng, 40) + ["A", "ACGT" * 8, "ACGT" * 8 + "A"]
+    # Similar pairs too, not just unrelated random sequences
+    sequences += [seq[:-3] + "TTT" for seq in sequences[:10]]
+
+    for seq1 in sequences:
+        for seq2 in sequences:
+            assert _similarity_kernel(*_pack(seq1), *_pack(seq2)) == pytest.approx(
+                _similarity_by_loop(seq1, seq2)
+            )
+
+
+def test_similarity_kernel_ignores_ambiguous_bases():
+    # An N never matches, not even another N
+    assert _similarity_kernel(*_pack("ACNT"), *_pack("ACNT")) == pytest.approx(0.75)
+    assert _similarity_kernel(*_pack("acgt"), *_pack("ACGT")) == pytest.approx(1.0)
+
+
+# FASTA parsing: the parsers must match the original line-based parser
+def _parse_fasta_content_baseline(content: str) -> List[tuple]:
+    sequences = []
+    current_name = None
+    current_seq = []
+
+    for line in content.strip().split('\n'):
+        line = line.strip()
+        if line.startswith('>'):
+            if current_name and current_seq:
+                sequences.append((current_name, ''.join(current_seq)))
+            current_name = line[1:].split()[0]
+            current_seq = []
+        elif line and current_name:
+            current_seq.append(line)
+
+    if current_name and current_seq:
+        sequences.append((current_name, ''.join(current_seq)))
+
+    return sequences
+
+
+FASTA_CASES = [
+    ">seq1 first sample\nACGTACGT\nGGCC\n>seq2\nTTTT\n",
+    ">seq1\r\nACGT\r\nAC\r\n>seq2 x y\r\nGG\r\n",
+    "leading junk\n>seq1\nACGT\n\n\n>empty\n>seq3\n  acgtn  \nAAAA",
+    ">only_header\n",
+    "",
+    ">a\nA\n>b\nC\n>c\nG\n>d\nT",
+]
+
+
+@pytest.mark.parametrize("content", FASTA_CASES)
+def test_parse_fasta_matches_baseline(content):
+    assert parse_fasta(content.encode()) == _parse_fasta_content_baseline(content)
+
+
+@pytest.mark.parametrize("content", FASTA_CASES)
+def test_parse_fasta_python_matches_baseline(content):
+    assert _parse_fasta_python(content.encode()) == _parse_fasta_content_baseline(content)
+
+
+def test_parse_fasta_matches_baseline_random():
+    rng = np.random.default_rng(0)
+    records = [(f"seq{i}", sequence) for i, sequence in enumerate(_random_sequences(rng, 200, max_length=500))]
+    # Wrap sequence lines at 60 columns, as FASTA writers do
+    content = "".join(
+        f">{name} description\n" + "".join(f"{seq[j:j + 60]}\n" for j in range(0, len(seq), 60))
+        for name, seq in records
+    )
+
+    assert parse_fasta(content.encode()) == _parse_fasta_content_baseline(content) == records
+
+
+# Embedding cache
+def test_embed_cache_computes_misses_once(tmp_path):
+    cache = EmbedCache(str(tmp_path / "cache.db"))
+    calls = []
+
+    def compute_many(sequences):
+        calls.append(list(sequences))
+        return [np.full(4, len(seq), dtype=np.float32) for seq in sequences]
+
+    first = cache.get_or_compute_many(["AC", "ACG", "AC"], "model", compute_many)
+    assert calls == [["AC", "ACG"]]
+    assert [e.tolist() for e in first] == [[2.0] * 4, [3.0] * 4, [2.0] * 4]
+
+    second = cache.get_or_compute_many(["ACG", "ACGT"], "model", compute_many)
+    assert calls[1:] == [["ACGT"]]
+    assert second[0].tolist() == [3.0] * 4
+
+
+def test_embed_cache_skips_none(tmp_path):
+    cache = EmbedCache(str(tmp_path / "cache.db"))
+    assert cache.put_many(["AC", "GT"], "m", [None, np.ones(2)])
+    assert cache.get_many(["AC", "GT"], "m")[0] is None
+    assert cache.get_many(["AC", "GT"], "m")[1].tolist() == [1.0, 1.0]
+
+
+def test_embed_cache_separates_model_variants(tmp_path):
+    cache = EmbedCache(str(tmp_path / "cache.db"))
+    cache.put_many(["AC"], "model:torch:float32", [np.ones(2)])
+    assert cache.get_many(["AC"], "model:onnx:float32") == [None]
+    assert cache.get_many(["AC"], "model:torch:int8") == [None]
+
+
+def test_embed_cache_expires_and_purges(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbedCache(path, ttl_seconds=0.05)
+    cache.put_many(["AC", "GT"], "m", [np.ones(2), np.ones(2)])
+    time.sleep(0.1)
+
+    # An expired hit is a miss and is deleted on lookup
+    assert cache.get_many(["AC"], "m") == [None]
+    assert cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 1
+
+    # The rest is purged when the cache is next opened
+    reopened = EmbedCache(path, ttl_seconds=0.05)
+    assert reopened._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 0